@@ -0,0 +1,74 @@
+"""Compares the pydantic decode path against the fast one on the fixture payloads.
+
+    python -m benchmarks.decode --number 2000
+
+Run it from the project root next to the bot's ``.env``, importing ``schedule_ogu.api`` loads ``config``.
+"""
+import argparse
+import json
+import pathlib
+import timeit
+
+import config
+from schedule_ogu.api import decode
+from schedule_ogu.api.models import ScheduleEntryHTTP, ExamHTTP, StudentGroupHTTP
+from schedule_ogu.api.utils import json_loads
+
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+EXCLUDE = {"employee_name", "employee_second_name", "employee_middle_name"}
+
+
+def pydantic_schedule(raw: bytes):
+    data = json.loads(raw)
+    return [ScheduleEntryHTTP.parse_obj(entry).dict(exclude=EXCLUDE) for index, entry in data.items()
+            if index.isdigit()]
+
+
+def fast_schedule(raw: bytes):
+    return [entry.db_fields() for entry in decode.schedule_entries(json_loads(raw))]
+
+
+def pydantic_exams(raw: bytes):
+    # Exams are stored under the upstream cell id, the same way ExamHTTP.db_fields does it
+    return [{**exam.dict(exclude=EXCLUDE | {"id", "photo_link"}), "cell_id": int(exam.id)}
+            for exam in map(ExamHTTP.parse_obj, json.loads(raw))]
+
+
+def fast_exams(raw: bytes):
+    return [entry.db_fields() for entry in decode.exams(json_loads(raw))]
+
+
+def pydantic_groups(raw: bytes):
+    return [StudentGroupHTTP.parse_obj(entry) for entry in json.loads(raw)]
+
+
+def fast_groups(raw: bytes):
+    return decode.student_groups(json_loads(raw))
+
+
+CASES = {
+    "printschedule.json": (pydantic_schedule, fast_schedule),
+    "printexamschedule.json": (pydantic_exams, fast_exams),
+    "grouplist.json": (pydantic_groups, fast_groups),
+}
+
+
+def main(number: int) -> None:
+    # Measure the fast path on its own, without the sampled validation
+    config.DECODE_VALIDATION_RATE = 0
+
+    for fixture, (slow, fast) in CASES.items():
+        raw = (FIXTURES / fixture).read_bytes()
+        assert slow(raw) == fast(raw), f"{fixture} decodes differently"
+        slow_time = min(timeit.repeat(lambda: slow(raw), number=number, repeat=3))
+        fast_time = min(timeit.repeat(lambda: fast(raw), number=number, repeat=3))
+        print(f"{fixture:>24}: pydantic {slow_time / number * 1e6:8.1f} us, "
+              f"fast {fast_time / number * 1e6:8.1f} us, x{slow_time / fast_time:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="Decodes per measurement")
+    args = parser.parse_args()
+    main(args.number)
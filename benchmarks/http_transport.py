@@ -0,0 +1,89 @@
+"""Compares the bare aiohttp session against the tuned transport profile.
+
+The replay server answers with the recorded ``printschedule`` payload, so only the
+transport settings differ between the two runs.
+
+    python -m benchmarks.http_transport --requests 2000 --concurrency 50
+
+Run it from the project root next to the bot's ``.env``, importing ``schedule_ogu.api`` loads ``config``.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.replay_server import ReplayProfile, create_app
+from schedule_ogu.api.transport import TransportProfile
+
+
+@web.middleware
+async def compressed(request: web.Request, handler) -> web.StreamResponse:
+    response = await handler(request)
+    response.enable_compression()
+    return response
+
+
+async def run(session: aiohttp.ClientSession, url: str, requests: int, concurrency: int,
+              headers_factory) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.get(url, headers=headers_factory()) as response:
+                await response.read()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+def report(name: str, elapsed: float, latencies: list[float]) -> None:
+    latencies.sort()
+    print(f"{name:>8}: {len(latencies) / elapsed:8.1f} req/s, "
+          f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.2f} ms")
+
+
+async def main(requests: int, concurrency: int, compress: bool, limit_per_host: int) -> None:
+    app = create_app(ReplayProfile(latency=0.002))
+    if compress:
+        app.middlewares.append(compressed)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://localhost:{port}/schedule/printschedule"
+
+    try:
+        # The way HTTPClient used to talk to the upstream: default connector, headers rebuilt per call
+        async with aiohttp.ClientSession() as session:
+            started = time.perf_counter()
+            latencies = await run(session, url, requests, concurrency,
+                                  lambda: {"user-agent": "bench", "cookie": "a=b; "})
+            report("baseline", time.perf_counter() - started, latencies)
+
+        profile = TransportProfile(compression=compress, limit_per_host=limit_per_host)
+        headers = {"user-agent": "bench", "cookie": "a=b; ", "accept-encoding": profile.accept_encoding}
+        async with profile.create_session() as session:
+            started = time.perf_counter()
+            latencies = await run(session, url, requests, concurrency, lambda: headers)
+            report("tuned", time.perf_counter() - started, latencies)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--compress", action="store_true", help="Serve gzip encoded responses")
+    parser.add_argument("--limit-per-host", type=int, default=TransportProfile().limit_per_host,
+                        help="Per-host pool of the tuned profile, it caps throughput below --concurrency on purpose")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.compress, args.limit_per_host))
@@ -0,0 +1,168 @@
+"""Local stand-in for oreluniver.ru that replays the payloads in ``benchmarks/fixtures``.
+
+Every ``Route`` family of ``schedule_ogu.api`` is served, the family being the last
+non-numeric path segment, so ``/schedule//7001///1662325500000/printschedule``
+answers with ``printschedule.json``. Point the bot at it with ``HTTP_BASE_URL``:
+
+    python -m benchmarks.replay_server --port 8081 --latency 80 --error-rate 0.05
+    HTTP_BASE_URL=http://127.0.0.1:8081 python starter.py polling
+
+``--throughput`` drops latency and failure injection and prints the served rate.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import pathlib
+import random
+import time
+
+from aiohttp import web
+
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+
+HTML_BODY = "<html><body><div>Пожалуйста, подтвердите использование cookie</div></body></html>"
+
+
+class ReplayProfile:
+    def __init__(
+            self,
+            latency: float = 0,
+            jitter: float = 0,
+            error_rate: float = 0,
+            reset_rate: float = 0,
+            html_rate: float = 0,
+            throughput: bool = False
+    ) -> None:
+        """How the replay server misbehaves
+
+        Parameters
+        ----------
+        latency : float
+            The delay, in seconds, before every answer.
+        jitter : float
+            Up to this many extra seconds are added to every delay.
+        error_rate : float
+            The share of requests answered with a 500, 502 or 504.
+        reset_rate : float
+            The share of requests whose connection is reset instead of answered.
+        html_rate : float
+            The share of requests answered with an HTML page, which forces the bot to refresh its cookies.
+        throughput : bool
+            Disables latency and failure injection.
+        """
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.error_rate: float = error_rate
+        self.reset_rate: float = reset_rate
+        self.html_rate: float = html_rate
+        self.throughput: bool = throughput
+
+
+def family_of(path: str) -> str:
+    return next((part for part in reversed(path.split("/")) if part and not part.isdigit()), "")
+
+
+def load_fixtures() -> dict[str, tuple[bytes, str]]:
+    """Fixture body and its ETag per route family"""
+    return {fixture.stem: (body := fixture.read_bytes(), f'"{hashlib.sha1(body).hexdigest()}"')
+            for fixture in FIXTURES.glob("*.json")}
+
+
+async def replay(request: web.Request) -> web.StreamResponse:
+    profile: ReplayProfile = request.app["profile"]
+    stats: collections.Counter = request.app["stats"]
+
+    fixture = request.app["fixtures"].get(family_of(request.path))
+    if fixture is None:
+        stats["not_found"] += 1
+        return web.json_response({"message": f"No fixture for {request.path}"}, status=404)
+    body, etag = fixture
+
+    if not profile.throughput:
+        delay = profile.latency + random.uniform(0, profile.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        roll = random.random()
+        if roll < profile.error_rate:
+            stats["error"] += 1
+            return web.Response(status=random.choice((500, 502, 504)), text="Upstream failure")
+        roll -= profile.error_rate
+        if roll < profile.reset_rate:
+            stats["reset"] += 1
+            request.transport.abort()
+            return web.Response(status=500)
+        roll -= profile.reset_rate
+        if roll < profile.html_rate:
+            stats["html"] += 1
+            return web.Response(text=HTML_BODY, content_type="text/html")
+
+    if request.headers.get("if-none-match") == etag:
+        stats["not_modified"] += 1
+        return web.Response(status=304, headers={"etag": etag})
+
+    stats["ok"] += 1
+    return web.Response(body=body, content_type="application/json", headers={"etag": etag})
+
+
+def create_app(profile: ReplayProfile | None = None) -> web.Application:
+    app = web.Application()
+    app["profile"] = profile or ReplayProfile()
+    app["fixtures"] = load_fixtures()
+    app["stats"] = collections.Counter()
+    app.router.add_get("/{tail:.*}", replay)
+    return app
+
+
+async def report(app: web.Application, every: float) -> None:
+    stats: collections.Counter = app["stats"]
+    served, started = sum(stats.values()), time.perf_counter()
+    while True:
+        await asyncio.sleep(every)
+        now, total = time.perf_counter(), sum(stats.values())
+        print(f"{(total - served) / (now - started):8.1f} req/s, {dict(stats)}", flush=True)
+        served, started = total, now
+
+
+async def main(host: str, port: int, profile: ReplayProfile, report_every: float) -> None:
+    app = create_app(profile)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Replaying {sorted(app['fixtures'])} on http://{host}:{port}", flush=True)
+    try:
+        if report_every:
+            await report(app, report_every)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0, help="Delay per request in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="Extra random delay per request in ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of 500/502/504 answers")
+    parser.add_argument("--reset-rate", type=float, default=0, help="Share of reset connections")
+    parser.add_argument("--html-rate", type=float, default=0, help="Share of non-JSON answers")
+    parser.add_argument("--throughput", action="store_true", help="No latency or failures, report the served rate")
+    parser.add_argument("--report-every", type=float, default=0, help="Print stats every N seconds")
+    args = parser.parse_args()
+
+    replay_profile = ReplayProfile(latency=args.latency / 1000,
+                                   jitter=args.jitter / 1000,
+                                   error_rate=args.error_rate,
+                                   reset_rate=args.reset_rate,
+                                   html_rate=args.html_rate,
+                                   throughput=args.throughput)
+    try:
+        asyncio.run(main(args.host, args.port, replay_profile, args.report_every or (5 if args.throughput else 0)))
+    except KeyboardInterrupt:
+        pass
@@ -14,6 +14,21 @@ class BotConfig(BaseSettings):
         env_prefix = "bot_"
 
 
+class HTTPConfig(BaseSettings):
+    base_url: str = "https://oreluniver.ru"
+    limit: int = 100
+    limit_per_host: int = 10
+    keepalive_timeout: float = 30
+    dns_cache_ttl: int = 300
+    connect_timeout: float = 5
+    read_timeout: float = 30
+    compression: bool = True
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "http_"
+
+
 class DatabaseConfig(BaseSettings):
     db: str
     host: str
@@ -26,12 +41,21 @@ class DatabaseConfig(BaseSettings):
         env_prefix = "postgres_"
 
 
+class WebConfig(BaseSettings):
+    host: str = "0.0.0.0"
+    port: int = 8080
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "web_"
+
+
 # Rate-limit config
 
 UNABLE_RATE_LIMIT = True
 
-UPDATE_FETCH_SCHEDULE = datetime.timedelta(hours=3)
-UPDATE_FETCH_EXAMS = datetime.timedelta(hours=3)
+UPDATE_FETCH_SCHEDULE = datetime.timedelta(hours=2)
+UPDATE_FETCH_EXAMS = datetime.timedelta(hours=2)
 UPDATE_FETCH_FACULTIES = datetime.timedelta(hours=24)
 UPDATE_FETCH_DEPARTMENTS = datetime.timedelta(hours=24)
 UPDATE_FETCH_EMPLOYEES = datetime.timedelta(hours=24)
@@ -39,6 +63,126 @@ UPDATE_FETCH_EMPLOYEE = datetime.timedelta(hours=3)
 UPDATE_FETCH_DATA = datetime.timedelta(days=180)
 
 
+# Catalog crawler config
+CRAWLER_CONCURRENCY = 8
+CRAWLER_RETRIES = 3
+
+
+# Read timeouts (seconds) per route family, the rest fall back to HTTPConfig.read_timeout
+HTTP_READ_TIMEOUTS = {
+    "divisionlistforstuds": 30,
+    "kaflist": 30,
+    "preplist": 30,
+    "grouplist": 30,
+    "printschedule": 15,
+    "printexamschedule": 15,
+}
+
+
+# Share of upstream entries that also go through full pydantic validation next to the fast
+# decode path, mismatches are logged. Set to 1 while debugging payload changes.
+DECODE_VALIDATION_RATE = 0.01
+
+
+# Outbound request budget per pool: requests per second, bucket size and requests in flight.
+# User requests are charged to "interactive", crawls and background refreshes to "background".
+
+REQUEST_BUDGET = {
+    "interactive": {"rate": 5, "burst": 10, "concurrency": 8},
+    "background": {"rate": 2, "burst": 4, "concurrency": 4},
+}
+
+
+# Circuit breaker config, while open the bot answers from the database
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RECOVERY_TIMEOUT = datetime.timedelta(seconds=60)
+
+
+# HTTP response cache config, route families missing from the TTL map are never cached
+
+UNABLE_HTTP_CACHE = True
+
+HTTP_CACHE_DIR = ".cache/http"
+HTTP_CACHE_MAX_SIZE = 64 * 1024 * 1024
+HTTP_CACHE_TTL = {
+    "divisionlistforstuds": datetime.timedelta(hours=24),
+    "kaflist": datetime.timedelta(hours=24),
+    "preplist": datetime.timedelta(hours=24),
+    "grouplist": datetime.timedelta(hours=24),
+    "printschedule": datetime.timedelta(minutes=10),
+    "printexamschedule": datetime.timedelta(minutes=30),
+}
+
+
+# Background refresh config. Schedules of groups and lecturers with registered users are warmed
+# in the REFRESH_WARMUP window ending at REFRESH_WARMUP_END, so they are fresh for the digest and
+# the first lesson, the rest is refreshed through the day as it gets stale.
+# The refresher runs in the "background" budget pool and never exceeds REFRESH_HOURLY_BUDGET fetches.
+
+UNABLE_REFRESHER = True
+
+REFRESH_TIMEZONE = "Europe/Moscow"
+REFRESH_FIRST_LESSON = datetime.time(hour=8, minute=30)
+REFRESH_WARMUP = datetime.timedelta(minutes=60)
+REFRESH_WARMUP_END = datetime.time(hour=8, minute=0)
+REFRESH_DAY_END = datetime.time(hour=21, minute=0)
+REFRESH_LEAD = datetime.timedelta(minutes=15)
+REFRESH_WEEKS = (0, 1)
+REFRESH_HOURLY_BUDGET = 600
+REFRESH_ACCESS_HALF_LIFE = datetime.timedelta(days=2)
+
+
+# Rendered message cache config, entries are also dropped as soon as their data changes.
+# Its hit rate, evictions and memory are logged with the other metrics, see METRICS_LOG_INTERVAL
+
+RENDER_CACHE_MAX_ENTRIES = 4096
+RENDER_CACHE_TTL = datetime.timedelta(minutes=30)
+
+
+# Daily digest config, opted in users get the schedule of the day at DIGEST_TIME.
+# It goes out once the refresher warmup is over, so it is read from already refreshed data.
+
+UNABLE_DIGEST = True
+
+DIGEST_TIMEZONE = REFRESH_TIMEZONE
+DIGEST_TIME = REFRESH_WARMUP_END
+# A run interrupted by a restart is resumed only until this moment of the same day
+DIGEST_DEADLINE = datetime.time(hour=12, minute=0)
+
+
+# Outgoing Telegram message limits: messages per second across all chats and seconds between
+# messages to the same chat
+
+SENDER_RATE = 30
+SENDER_CHAT_INTERVAL = 1
+
+
+# Inline mode config, results are cached by Telegram for INLINE_CACHE_TIME seconds
+
+INLINE_RESULTS = 10
+INLINE_CACHE_TIME = 60
+
+
+# Calendar feed config, /ics/group/<id>.ics and /ics/employee/<id>.ics serve the lessons from
+# ICS_PAST before today to ICS_FUTURE after it. A feed is only rebuilt when its lessons changed.
+
+UNABLE_ICS_FEED = True
+
+ICS_TIMEZONE = REFRESH_TIMEZONE
+ICS_PAST = datetime.timedelta(days=14)
+ICS_FUTURE = datetime.timedelta(days=42)
+ICS_CACHE_MAX_ENTRIES = 1024
+ICS_CACHE_TTL = datetime.timedelta(hours=24)
+
+
+# Metrics log config, request budget queues and cache hit rates are logged every METRICS_LOG_INTERVAL
+
+UNABLE_METRICS_LOG = True
+
+METRICS_LOG_INTERVAL = datetime.timedelta(minutes=5)
+
+
 # Constants for calculating time
 START_SEMESTER = int(datetime.datetime(2022, 8, 29).timestamp())
 BASE_WEEK_DELTA = 0
@@ -49,7 +193,9 @@ UNABLE_EXAM_BUTTON = False
 
 
 bot_config = BotConfig()
+http_config = HTTPConfig()
 db_config = DatabaseConfig()
+web_config = WebConfig()
 tortoise_config = {
     "connections": {
         "default": {
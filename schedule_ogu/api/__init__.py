@@ -1,4 +1,5 @@
 import asyncio
+import errno
 import time
 import typing
 import typing as t
@@ -7,6 +8,7 @@ from datetime import datetime, timedelta
 import aiohttp
 import pytz
 
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
 from aiohttp import ClientConnectorError
 from fake_useragent import UserAgent
@@ -15,28 +17,67 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from loguru import logger
 
-from config import bot_config
+import config
+from config import bot_config, http_config
 from schedule_ogu.utils.time import ScheduleTime
 from schedule_ogu.models.enums import Years
 from schedule_ogu.models.db import UserAgentModel, CookieModel
+from schedule_ogu.utils.singleflight import SingleFlight
 
-from .models import (ScheduleEntryHTTP,
-                     StudentGroupHTTP,
+from .models import (StudentGroupHTTP,
                      FacultyHTTP,
                      DepartmentHTTP,
                      EmployeeHTTP, ScheduleHTTP,
                      ExamHTTP)
 
+from . import decode
+from .breaker import CircuitBreaker
+from .budget import RequestBudget
+from .cache import CacheEntry, ResponseCache
 from .utils import flatten_error_dict, json_or_text
-from .erorrs import HTTPException
+from .erorrs import HTTPException, UpstreamUnavailable
+from .transport import TransportProfile
+
+
+def _fetch_cookies(chrome_driver_dir: str) -> tuple[str, str]:
+    """Opens the site in Chrome and returns a fresh ``(user_agent, cookie)`` pair.
+
+    Blocking, meant to be run in an executor.
+    """
+    user_agent = UserAgent().chrome
+
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument(f'user-agent={user_agent}')
+    chrome_options.add_argument("--start-maximized")  # open Browser in maximized mode
+    chrome_options.add_argument("--no-sandbox")  # bypass OS security model
+    chrome_options.add_argument("--disable-dev-shm-usage")  # overcome limited resource problems
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+
+    s = Service(executable_path=chrome_driver_dir)
+    driver = webdriver.Chrome(service=s, options=chrome_options)
+    try:
+        logger.info("Fetching cookies for user-agent {}", user_agent)
+        driver.get(Route.BASE)
+        time.sleep(5)
+        cookie_btn = driver.find_element(By.XPATH, '/html/body/div[6]/div/div/div/div')
+        cookie_btn.click()
+        cookies = driver.get_cookies()
+        logger.info("Fetched cookies {}", cookies)
+        return user_agent, "".join(f'{cookie.get("name")}={cookie.get("value")}; ' for cookie in cookies)
+    finally:
+        driver.close()
+        driver.quit()
 
 
 class Route:
-    BASE: t.ClassVar[str] = 'https://oreluniver.ru'
+    BASE: t.ClassVar[str] = http_config.base_url
 
     def __init__(self, method: str, path: str, **parameters: t.Any) -> None:
         self.path: str = path
         self.method: str = method
+        # The last literal path segment, e.g. ``printschedule`` or ``kaflist``
+        self.family: str = next(part for part in reversed(path.split('/')) if part and '{' not in part)
         url = self.BASE + self.path
         if parameters:
             url = url.format_map({k: quote(v) if isinstance(v, str) else v for k, v in parameters.items()})
@@ -46,6 +87,9 @@ class Route:
 class HTTPClient:
     """Represents an HTTP client sending HTTP requests to the oreluniver.ru"""
 
+    _student_schedule_path: t.ClassVar[str] = '/schedule//{object_id}///{timestamp}/printschedule'
+    _employee_schedule_path: t.ClassVar[str] = '/schedule/{object_id}////{timestamp}/printschedule'
+
     def __init__(
             self,
             loop: t.Optional[asyncio.AbstractEventLoop] = None
@@ -56,10 +100,26 @@ class HTTPClient:
         self.user_agent: t.Optional[str] = ""
         self.cookie: t.Optional[str] = ""
 
+        self.transport: TransportProfile = TransportProfile(read_timeouts=config.HTTP_READ_TIMEOUTS,
+                                                            **http_config.dict(exclude={"base_url"}))
+        self._headers: t.Dict[str, str] = {}
+        self._headers_for: t.Tuple[t.Optional[str], t.Optional[str]] = (None, None)
+
+        # Chrome is driven synchronously, so it gets its own thread instead of the event loop
+        self._cookie_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cookies")
+        self._cookie_flight: SingleFlight = SingleFlight()
+
+        self.budget: RequestBudget = RequestBudget(config.REQUEST_BUDGET)
+        self.breaker: CircuitBreaker = CircuitBreaker(config.BREAKER_FAILURE_THRESHOLD,
+                                                      config.BREAKER_RECOVERY_TIMEOUT.total_seconds())
+
+        self.cache: t.Optional[ResponseCache] = None
+        if config.UNABLE_HTTP_CACHE:
+            self.cache = ResponseCache(config.HTTP_CACHE_DIR, config.HTTP_CACHE_MAX_SIZE, config.HTTP_CACHE_TTL)
+
     async def init(self):
         logger.info("Starting API (oreluniver.ru)")
-        # Necessary to get aiohttp to stop complaining about session creation
-        self.__session = aiohttp.ClientSession(loop=self.loop)
+        self.__session = self.transport.create_session()
         user_agent = await UserAgentModel.filter().order_by("-datetime").first()
         if user_agent:
             self.user_agent = user_agent.extra
@@ -73,42 +133,48 @@ class HTTPClient:
     async def close(self) -> None:
         if self.__session:
             await self.__session.close()
+        self._cookie_executor.shutdown(wait=False, cancel_futures=True)
 
-    async def update_cookies(self):
+    async def update_cookies(self, stale_cookie: t.Optional[str] = None) -> None:
+        """Refreshes the cookie/user-agent pair, concurrent callers share a single browser run.
+
+        Passing the cookie a failed request was sent with makes the call a no-op
+        when another caller has already replaced it in the meantime.
+        """
+        if stale_cookie is not None and stale_cookie != self.cookie:
+            return
+        await self._cookie_flight.do("cookies", self._update_cookies)
+
+    async def _update_cookies(self) -> None:
         user_agent = await UserAgentModel.filter().order_by("-datetime").first()
         if user_agent and user_agent.datetime > (datetime.utcnow() - timedelta(minutes=1)).astimezone(pytz.utc):
-            raise RuntimeError('Unreachable code in HTTP handling')
-
-        chrome_options = webdriver.ChromeOptions()
-        ua = UserAgent()
-        chrome_options.add_argument(f'user-agent={self.user_agent}')
-        self.user_agent = ua.chrome
-        chrome_options.add_argument("--start-maximized")  # open Browser in maximized mode
-        chrome_options.add_argument("--no-sandbox")  # bypass OS security model
-        chrome_options.add_argument("--disable-dev-shm-usage")  # overcome limited resource problems
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-
-        s = Service(executable_path=bot_config.chrome_driver_dir)
-        driver = webdriver.Chrome(service=s, options=chrome_options)
-        try:
-            logger.info("Fetching cookies for user-agent {}", user_agent)
-            driver.get(Route.BASE)
-            time.sleep(5)
-            cookie_btn = driver.find_element(By.XPATH, '/html/body/div[6]/div/div/div/div')
-            cookie_btn.click()
-            cookies = driver.get_cookies()
-            logger.info("Fetched cookies {}", cookies)
-            self.cookie = "".join(f'{cookie.get("name")}={cookie.get("value")}; ' for cookie in cookies)
-
-            await UserAgentModel.create(extra=self.user_agent, datetime=datetime.utcnow())
-            await CookieModel.create(extra=self.cookie, datetime=datetime.utcnow())
+            # Refreshed moments ago, most likely by another instance of the bot
+            cookie = await CookieModel.filter().order_by("-datetime").first()
+            if cookie:
+                self.user_agent = user_agent.extra
+                self.cookie = cookie.extra
+            return
 
+        try:
+            self.user_agent, self.cookie = await self.loop.run_in_executor(self._cookie_executor,
+                                                                           _fetch_cookies,
+                                                                           bot_config.chrome_driver_dir)
         except Exception as ex:
             logger.error(ex)
-        finally:
-            driver.close()
-            driver.quit()
+            return
+
+        await UserAgentModel.create(extra=self.user_agent, datetime=datetime.utcnow())
+        await CookieModel.create(extra=self.cookie, datetime=datetime.utcnow())
+
+    @property
+    def headers(self) -> t.Dict[str, str]:
+        """Headers sent with every request, only rebuilt when the cookie/user-agent pair changes"""
+        if self._headers_for != (self.user_agent, self.cookie):
+            self._headers = {"user-agent": self.user_agent,
+                             "cookie": self.cookie,
+                             "accept-encoding": self.transport.accept_encoding}
+            self._headers_for = (self.user_agent, self.cookie)
+        return self._headers
 
     async def request(self, route: Route, **kwargs: t.Any) -> t.Any:
         url = route.url
@@ -117,11 +183,31 @@ class HTTPClient:
         response: t.Optional[aiohttp.ClientResponse] = None
         data: t.Optional[t.Union[t.Dict[str, t.Any], str]] = None
 
+        cached: t.Optional[CacheEntry] = None
+        if self.cache is not None and self.cache.accepts(route.family):
+            cached = await self.cache.get(url)
+            if cached is not None and cached.is_fresh(self.cache.ttl[route.family]):
+                return cached.data
+
+        if not self.breaker.allow():
+            if cached is not None:
+                return cached.data
+            raise UpstreamUnavailable(f"Circuit breaker is open, {url} was not requested")
+
+        kwargs.setdefault("timeout", self.transport.timeout_for(route.family))
+
         for tries in range(5):
+            # Someone else's failures may have opened the breaker while we were backing off
+            if tries and self.breaker.is_open:
+                break
+
             try:
-                headers: t.Dict[str, str] = {"user-agent": self.user_agent, "cookie": self.cookie}
+                headers = self.headers
+                if cached is not None:
+                    headers = {**headers, **cached.validators}
 
-                async with self.__session.request("get", url, headers=headers, **kwargs) as response:
+                async with self.budget.slot(), self.__session.request("get", url, headers=headers,
+                                                                      **kwargs) as response:
                     logger.debug('{method} {url} with {data} has returned {status}',
                                  method=method,
                                  url=url,
@@ -129,35 +215,70 @@ class HTTPClient:
                                  status=response.status
                                  )
 
-                    # even errors have text involved in them so this is safe to call
-                    data = await json_or_text(response)
-                    if data is None:
-                        await self.update_cookies()
-                        continue
-
-                    # the request was successful so just return the text/json
-                    if 300 > response.status >= 200:
-                        logger.debug('{method} {url} has received {data}',
-                                     method=method,
-                                     url=url,
-                                     data=data
-                                     )
-                        return data
-
-                    # we've received a 500, 502, or 504, unconditional retry
-                    if response.status in {500, 502, 504}:
-                        await asyncio.sleep(1 + tries * 2)
-                        continue
+                    if response.status not in {500, 502, 504}:
+                        self.breaker.record_success()
+
+                        # the upstream confirmed our cached copy is still current
+                        if response.status == 304 and cached is not None:
+                            await self.cache.revalidated(url, cached)
+                            return cached.data
+
+                        # even errors have text involved in them so this is safe to call
+                        data = await json_or_text(response)
+
+                        # the request was successful so just return the text/json
+                        if data is not None and 300 > response.status >= 200:
+                            logger.debug('{method} {url} has received {data}',
+                                         method=method,
+                                         url=url,
+                                         data=data
+                                         )
+                            if self.cache is not None and self.cache.accepts(route.family):
+                                await self.cache.put(url, data, response.headers)
+                            return data
+
+                # Backing off and refreshing cookies happen outside the budget slot
+
+                # we've received a 500, 502, or 504, unconditional retry
+                if response.status in {500, 502, 504}:
+                    self.breaker.record_failure()
+                    await asyncio.sleep(1 + tries * 2)
+                    continue
+
+                # not JSON, the site wants fresh cookies
+                if data is None:
+                    await self.update_cookies(stale_cookie=headers["cookie"])
+                    continue
 
             # This is handling exceptions from the request
+            # ClientConnectorError is an OSError too, so it has to come first
+            except ClientConnectorError as e:
+                self.breaker.record_failure()
+                if tries < 4:
+                    await asyncio.sleep(1 + tries * 2)
+                    continue
+                raise UpstreamUnavailable(f"Could not connect to {Route.BASE}") from e
+            # TimeoutError is an OSError since Python 3.11, so it has to come before it too
+            except asyncio.TimeoutError as e:
+                self.breaker.record_failure()
+                if tries < 4:
+                    await asyncio.sleep(1 + tries * 2)
+                    continue
+                raise UpstreamUnavailable(f"{url} timed out") from e
             except OSError as e:
-                # Connection reset by peer
-                if tries < 4 and e.errno in (54, 10054):
+                self.breaker.record_failure()
+                # Connection reset by peer on macOS/Windows and Linux
+                if tries < 4 and e.errno in (54, 10054, errno.ECONNRESET):
+                    await asyncio.sleep(1 + tries * 2)
+                    continue
+                raise UpstreamUnavailable(f"{url} failed: {e}") from e
+            # Dropped connections and broken bodies, e.g. ServerDisconnectedError or ClientPayloadError
+            except aiohttp.ClientError as e:
+                self.breaker.record_failure()
+                if tries < 4:
                     await asyncio.sleep(1 + tries * 2)
                     continue
-                raise
-            except ClientConnectorError:
-                return None
+                raise UpstreamUnavailable(f"{url} failed: {e!r}") from e
 
         if response is not None:
             # We've run out of retries, raise.
@@ -166,39 +287,73 @@ class HTTPClient:
 
             raise HTTPException(response, data)
 
+        if self.breaker.is_open:
+            raise UpstreamUnavailable(f"Circuit breaker opened while requesting {url}")
+
         raise RuntimeError('Unreachable code in HTTP handling')
 
-    async def get_schedule_student(self, group_id: int, week_delta: int = 0) -> t.Optional[ScheduleHTTP]:
-        timestamp = ScheduleTime.compute_timestamp_for_api(week_delta)
-        route = Route('GET', '/schedule//{group_id}///{timestamp}/printschedule',
-                      group_id=group_id,
-                      timestamp=timestamp)
+    async def _get_schedule(self, path: str, object_id: int, timestamp: int) -> t.Optional[ScheduleHTTP]:
+        route = Route('GET', path, object_id=object_id, timestamp=f"{timestamp}000")
         data: dict = await self.request(route)
         if not data:
             return
-        schedule = ScheduleHTTP(ScheduleTime.compute_timestamp(week_delta=week_delta),
-                                sorted([ScheduleEntryHTTP.parse_obj(raw) for index, raw in data.items()
-                                        if index.isdigit()],
-                                       key=lambda x: x.date))
-        return schedule
+        return ScheduleHTTP(timestamp, sorted(decode.schedule_entries(data), key=lambda x: x.date))
+
+    async def _get_schedule_range(
+            self,
+            path: str,
+            object_id: int,
+            weeks: t.Iterable[int]
+    ) -> t.Dict[int, t.Optional[ScheduleHTTP]]:
+        base = ScheduleTime.compute_timestamp()
+        weeks = list(dict.fromkeys(weeks))
+        # Bounded by the connector's per-host pool
+        schedules = await asyncio.gather(*(self._get_schedule(path, object_id, base + week * ScheduleTime.time_week)
+                                           for week in weeks),
+                                         return_exceptions=True)
+
+        errors = [schedule for schedule in schedules if isinstance(schedule, BaseException)]
+        if errors and len(errors) == len(weeks):
+            raise errors[0]
+        for week, schedule in zip(weeks, schedules):
+            if isinstance(schedule, BaseException):
+                logger.warning("Failed to fetch week {} of {}: {!r}", week, object_id, schedule)
+
+        return {week: schedule for week, schedule in zip(weeks, schedules)
+                if not isinstance(schedule, BaseException)}
+
+    async def get_schedule_student(self, group_id: int, week_delta: int = 0) -> t.Optional[ScheduleHTTP]:
+        return await self._get_schedule(self._student_schedule_path,
+                                        group_id,
+                                        ScheduleTime.compute_timestamp(week_delta=week_delta))
 
     async def get_schedule_employee(self, employee_id: int, week_delta: int = 0) -> t.Optional[ScheduleHTTP]:
-        timestamp = ScheduleTime.compute_timestamp_for_api(week_delta=week_delta)
-        route = Route('GET', '/schedule/{employee_id}////{timestamp}/printschedule',
-                      employee_id=employee_id,
-                      timestamp=timestamp)
-        data: dict = await self.request(route)
-        if not data:
-            return
-        return ScheduleHTTP(ScheduleTime.compute_timestamp(week_delta=week_delta),
-                            sorted([ScheduleEntryHTTP.parse_obj(raw) for index, raw in data.items()
-                                    if index.isdigit()],
-                                   key=lambda x: x.date))
+        return await self._get_schedule(self._employee_schedule_path,
+                                        employee_id,
+                                        ScheduleTime.compute_timestamp(week_delta=week_delta))
+
+    async def get_schedule_student_range(
+            self,
+            group_id: int,
+            weeks: t.Iterable[int]
+    ) -> t.Dict[int, t.Optional[ScheduleHTTP]]:
+        """Fetches several weeks at once, keyed by week delta. Weeks that came back empty are None,
+        weeks that failed are missing."""
+        return await self._get_schedule_range(self._student_schedule_path, group_id, weeks)
+
+    async def get_schedule_employee_range(
+            self,
+            employee_id: int,
+            weeks: t.Iterable[int]
+    ) -> t.Dict[int, t.Optional[ScheduleHTTP]]:
+        """Fetches several weeks at once, keyed by week delta. Weeks that came back empty are None,
+        weeks that failed are missing."""
+        return await self._get_schedule_range(self._employee_schedule_path, employee_id, weeks)
 
     async def get_groups(self, faculty_id: int, course: Years) -> t.List[StudentGroupHTTP]:
         route = Route('GET', '/schedule/{faculty_id}/{course}/grouplist', faculty_id=faculty_id, course=course.value)
         data: dict = await self.request(route)
-        return [StudentGroupHTTP.parse_obj(raw) for raw in data]
+        return decode.student_groups(data)
 
     async def get_faculties(self) -> t.List[FacultyHTTP]:
         route = Route('GET', '/schedule/divisionlistforstuds')
@@ -224,11 +379,9 @@ class HTTPClient:
     async def get_exams_student(self, group_id: int) -> typing.List[ExamHTTP]:
         route = Route('GET', '/schedule/{group_id}////printexamschedule', group_id=group_id)
         data: dict = await self.request(route)
-        return sorted([ExamHTTP.parse_obj(raw) for raw in data],
-                      key=lambda x: x.time)
+        return sorted(decode.exams(data), key=lambda x: x.time)
 
     async def get_exams_employee(self, employee_id: int) -> typing.List[ExamHTTP]:
         route = Route('GET', '/schedule//{employee_id}///printexamschedule', employee_id=employee_id)
         data: dict = await self.request(route)
-        return sorted([ExamHTTP.parse_obj(raw) for raw in data],
-                      key=lambda x: x.time)
+        return sorted(decode.exams(data), key=lambda x: x.time)
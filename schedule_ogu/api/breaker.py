@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import enum
+import time
+
+from loguru import logger
+
+
+__all__ = ("BreakerState",
+           "CircuitBreaker",
+           )
+
+
+class BreakerState(enum.IntEnum):
+    """All possible circuit breaker states."""
+
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, recovery_timeout: float, probes: int = 1) -> None:
+        """Circuit breaker guarding the upstream
+
+        Parameters
+        ----------
+        failure_threshold : int
+            The amount of consecutive failures after which the breaker opens.
+        recovery_timeout : float
+            The period, in seconds, the breaker stays open before letting probes through.
+        probes : int
+            The amount of probe requests allowed in flight while half-open.
+        """
+        self.failure_threshold: int = failure_threshold
+        self.recovery_timeout: float = recovery_timeout
+        self.probes: int = probes
+
+        self.failures: int = 0
+        self._state: BreakerState = BreakerState.CLOSED
+        self._opened_at: float = 0
+        self._probes_in_flight: int = 0
+
+    @property
+    def state(self) -> BreakerState:
+        now = time.monotonic()
+        if self._state != BreakerState.CLOSED and now - self._opened_at >= self.recovery_timeout:
+            if self._state == BreakerState.OPEN:
+                logger.info("Circuit breaker half-open, probing the upstream")
+            # Also hands out fresh probe slots if the previous probes never reported back
+            self._state = BreakerState.HALF_OPEN
+            self._opened_at = now
+            self._probes_in_flight = 0
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently being rejected without a probe slot"""
+        state = self.state
+        return state == BreakerState.OPEN or (state == BreakerState.HALF_OPEN
+                                              and self._probes_in_flight >= self.probes)
+
+    def allow(self) -> bool:
+        """Returns a boolean determining if a request may be sent, claims a probe slot while half-open."""
+        state = self.state
+        if state == BreakerState.CLOSED:
+            return True
+        if state == BreakerState.HALF_OPEN and self._probes_in_flight < self.probes:
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._state != BreakerState.CLOSED:
+            logger.info("Circuit breaker closed, the upstream is reachable again")
+        self._state = BreakerState.CLOSED
+        self.failures = 0
+        self._probes_in_flight = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._state == BreakerState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != BreakerState.OPEN:
+                logger.warning("Circuit breaker opened after {} consecutive failures", self.failures)
+            self._state = BreakerState.OPEN
+            self._opened_at = time.monotonic()
+            self._probes_in_flight = 0
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import time
+import typing as t
+
+
+__all__ = ("BudgetPool",
+           "RequestBudget",
+           "background_requests",
+           )
+
+_request_pool: contextvars.ContextVar[str] = contextvars.ContextVar("request_pool", default="interactive")
+
+
+@contextlib.contextmanager
+def background_requests() -> t.Iterator[None]:
+    """Upstream requests made inside, including from tasks started inside, are charged to the background pool"""
+    token = _request_pool.set("background")
+    try:
+        yield
+    finally:
+        _request_pool.reset(token)
+
+
+class BudgetPool:
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int) -> None:
+        """Token bucket plus concurrency cap, waiters are served first come first served
+
+        Parameters
+        ----------
+        name : str
+            The name of the pool, used in metrics.
+        rate : float
+            The amount of requests per second the bucket refills with.
+        burst : int
+            The capacity of the bucket.
+        concurrency : int
+            The amount of requests allowed in flight at once.
+        """
+        self.name: str = name
+        self.rate: float = rate
+        self.burst: int = burst
+        self.concurrency: int = concurrency
+
+        self.queued: int = 0
+        self.in_flight: int = 0
+        self.acquired: int = 0
+        self.total_wait: float = 0
+        self.max_wait: float = 0
+
+        self._tokens: float = burst
+        self._updated: float = time.monotonic()
+        # Both hand out in FIFO order, which is what keeps the queue fair
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                async with self._lock:
+                    await self._take_token()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.queued -= 1
+
+        waited = time.monotonic() - started
+        self.in_flight += 1
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def metrics(self) -> dict[str, float]:
+        return {"queued": self.queued,
+                "in_flight": self.in_flight,
+                "acquired": self.acquired,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0,
+                "max_wait": self.max_wait}
+
+
+class RequestBudget:
+    def __init__(self, pools: t.Mapping[str, t.Mapping[str, float]]) -> None:
+        """Caps how hard the upstream is hit, separately for interactive and background work
+
+        Parameters
+        ----------
+        pools : Mapping[str, Mapping[str, float]]
+            ``BudgetPool`` arguments per pool name, must contain ``interactive`` and ``background``.
+        """
+        self.pools: dict[str, BudgetPool] = {name: BudgetPool(name, **options) for name, options in pools.items()}
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> t.AsyncIterator[BudgetPool]:
+        pool = self.pools[_request_pool.get()]
+        await pool.acquire()
+        try:
+            yield pool
+        finally:
+            pool.release()
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        return {name: pool.metrics() for name, pool in self.pools.items()}
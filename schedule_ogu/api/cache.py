@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import typing as t
+from datetime import timedelta
+
+from loguru import logger
+from multidict import CIMultiDictProxy
+
+
+__all__ = ("CacheEntry",
+           "ResponseCache",
+           )
+
+
+class CacheEntry:
+    def __init__(
+            self,
+            data: t.Any,
+            stored_at: float,
+            etag: t.Optional[str] = None,
+            last_modified: t.Optional[str] = None
+    ) -> None:
+        self.data: t.Any = data
+        self.stored_at: float = stored_at
+        self.etag: t.Optional[str] = etag
+        self.last_modified: t.Optional[str] = last_modified
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    @property
+    def validators(self) -> dict[str, str]:
+        """Headers turning a request for this entry into a conditional GET"""
+        headers = {}
+        if self.etag:
+            headers["if-none-match"] = self.etag
+        if self.last_modified:
+            headers["if-modified-since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, directory: str, max_size: int, ttl: t.Mapping[str, timedelta]) -> None:
+        """Size-bounded on-disk cache of decoded upstream responses keyed by ``Route.url``
+
+        Parameters
+        ----------
+        directory : str
+            Where the entries are stored, one JSON file per url.
+        max_size : int
+            The total size of all entries in bytes, least recently used ones are evicted first.
+        ttl : Mapping[str, timedelta]
+            How long an entry is served without revalidation, per route family.
+            Families missing here are never cached.
+        """
+        self.directory: str = directory
+        self.max_size: int = max_size
+        self.ttl: dict[str, float] = {family: delta.total_seconds() for family, delta in ttl.items()}
+
+        # file name -> (size, last access)
+        self._index: t.Optional[dict[str, tuple[int, float]]] = None
+        self._size: int = 0
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    def accepts(self, family: str) -> bool:
+        return family in self.ttl
+
+    async def get(self, url: str) -> t.Optional[CacheEntry]:
+        await self._ensure_index()
+        name = self._name(url)
+        if name not in self._index:
+            return None
+
+        try:
+            raw = await asyncio.to_thread(self._read, name)
+        except (OSError, ValueError) as e:
+            logger.warning("Dropping unreadable cache entry for {}: {!r}", url, e)
+            await self._remove(name)
+            return None
+
+        self._index[name] = (self._index[name][0], time.time())
+        return CacheEntry(raw["data"], raw["stored_at"], raw.get("etag"), raw.get("last_modified"))
+
+    async def put(self, url: str, data: t.Any, headers: t.Optional[CIMultiDictProxy[str]] = None) -> CacheEntry:
+        headers = headers or {}
+        entry = CacheEntry(data, time.time(), headers.get("etag"), headers.get("last-modified"))
+        await self._store(url, entry)
+        return entry
+
+    async def revalidated(self, url: str, entry: CacheEntry) -> None:
+        """Restarts the TTL of an entry the upstream has answered 304 for"""
+        entry.stored_at = time.time()
+        await self._store(url, entry)
+
+    async def _store(self, url: str, entry: CacheEntry) -> None:
+        await self._ensure_index()
+        name = self._name(url)
+        payload = json.dumps({"url": url,
+                              "stored_at": entry.stored_at,
+                              "etag": entry.etag,
+                              "last_modified": entry.last_modified,
+                              "data": entry.data}, ensure_ascii=False).encode()
+        if len(payload) > self.max_size:
+            return
+
+        async with self._lock:
+            await asyncio.to_thread(self._write, name, payload)
+            self._size += len(payload) - self._index.get(name, (0, 0))[0]
+            self._index[name] = (len(payload), time.time())
+            await self._evict()
+
+    async def _evict(self) -> None:
+        if self._size <= self.max_size:
+            return
+
+        for name, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            await self._remove(name)
+            if self._size <= self.max_size:
+                break
+
+    async def _remove(self, name: str) -> None:
+        size, _ = self._index.pop(name, (0, 0))
+        self._size -= size
+        try:
+            await asyncio.to_thread(os.remove, os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    async def _ensure_index(self) -> None:
+        if self._index is not None:
+            return
+        self._index = await asyncio.to_thread(self._scan)
+        self._size = sum(size for size, _ in self._index.values())
+        logger.info("Loaded HTTP cache with {} entries ({} bytes)", len(self._index), self._size)
+
+    def _scan(self) -> dict[str, tuple[int, float]]:
+        os.makedirs(self.directory, exist_ok=True)
+        index = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    index[entry.name] = (stat.st_size, stat.st_mtime)
+        return index
+
+    def _read(self, name: str) -> dict[str, t.Any]:
+        with open(os.path.join(self.directory, name), "rb") as f:
+            return json.loads(f.read())
+
+    def _write(self, name: str, payload: bytes) -> None:
+        path = os.path.join(self.directory, name)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _name(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest() + ".json"
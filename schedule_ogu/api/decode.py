@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import functools
+import random
+import typing as t
+from datetime import datetime
+
+from loguru import logger
+
+import config
+from schedule_ogu.models.enums import DayType, SubjectType, subject_type_ru, educational_level_ru
+
+from .models import ScheduleEntryHTTP, ExamHTTP, StudentGroupHTTP
+
+
+__all__ = ("schedule_entries",
+           "exams",
+           "student_groups",
+           )
+
+M = t.TypeVar("M", ScheduleEntryHTTP, ExamHTTP, StudentGroupHTTP)
+
+# DayWeek is 1-based upstream
+_days: dict[int, DayType] = {day.value + 1: day for day in DayType}
+
+
+@functools.lru_cache(maxsize=512)
+def _lesson_date(value: str) -> int:
+    return int(datetime.strptime(value, "%Y-%m-%d").timestamp())
+
+
+@functools.lru_cache(maxsize=512)
+def _exam_date(value: str) -> int:
+    return int(datetime.strptime(value, "%d.%m.%Y").timestamp())
+
+
+def _subject_type(value: str) -> SubjectType:
+    subject_type = subject_type_ru.get(value)
+    if subject_type is None:
+        raise ValueError(f"Unknown lesson type {value!r}")
+    return subject_type
+
+
+def _sampled(model: t.Type[M], raw: t.Mapping[str, t.Any], built: M) -> M:
+    """Runs full pydantic validation on a sample of the payloads and reports where the fast path disagrees"""
+    if config.DECODE_VALIDATION_RATE and random.random() < config.DECODE_VALIDATION_RATE:
+        validated = model.parse_obj(raw)
+        if validated != built:
+            logger.warning("Fast {} decode differs from validation: {} != {}", model.__name__, built, validated)
+            return validated
+    return built
+
+
+def schedule_entries(data: t.Mapping[str, t.Any]) -> list[ScheduleEntryHTTP]:
+    """Decodes a ``printschedule`` payload without running the pydantic validators on every entry"""
+    construct = ScheduleEntryHTTP.construct
+    entries = []
+    for index, raw in data.items():
+        if not index.isdigit():
+            continue
+        entry = construct(id=str(raw["id_cell"]),
+                          name=str(raw["TitleSubject"]),
+                          type=_subject_type(raw["TypeLesson"]),
+                          subject_id=int(raw["idSubject"]),
+                          title=str(raw["title"]),
+                          department_name=str(raw["special"]),
+                          date=_lesson_date(raw["DateLesson"]),
+                          day=_days[int(raw["DayWeek"])],
+                          sub_group=int(raw["NumberSubGruop"]),
+                          building=str(raw["Korpus"]),
+                          audience=str(raw["NumberRoom"]),
+                          number=int(raw["NumberLesson"]),
+                          employee_id=int(raw["employee_id"]),
+                          employee_name=str(raw["Name"]),
+                          employee_second_name=str(raw["Family"]),
+                          employee_middle_name=str(raw["SecondName"]),
+                          group_id=int(raw["idGruop"]),
+                          zoom_link=raw.get("zoom_link"),
+                          zoom_password=raw.get("zoom_password"))
+        entries.append(_sampled(ScheduleEntryHTTP, raw, entry))
+    return entries
+
+
+def exams(data: t.Iterable[t.Mapping[str, t.Any]]) -> list[ExamHTTP]:
+    """Decodes a ``printexamschedule`` payload without running the pydantic validators on every entry"""
+    construct = ExamHTTP.construct
+    entries = []
+    for raw in data:
+        entry = construct(photo_link=str(raw["foto_link"]),
+                          id=str(raw["id_cell"]),
+                          name=str(raw["TitleSubject"]),
+                          type=_subject_type(raw["TypeLesson"]),
+                          date=_exam_date(raw["DateLesson"]),
+                          day=_days[int(raw["DayWeek"])],
+                          sub_group=int(raw["NumberSubGruop"]),
+                          dislocation=str(raw["NumberRoom"]),
+                          number=int(raw["NumberLesson"]),
+                          time=str(raw["Time"]),
+                          employee_id=int(raw["employee_id"]),
+                          employee_name=str(raw["Name"]),
+                          employee_second_name=str(raw["Family"]),
+                          employee_middle_name=str(raw["SecondName"]),
+                          group_id=int(raw["idGruop"]))
+        entries.append(_sampled(ExamHTTP, raw, entry))
+    return entries
+
+
+def student_groups(data: t.Iterable[t.Mapping[str, t.Any]]) -> list[StudentGroupHTTP]:
+    """Decodes a ``grouplist`` payload without running the pydantic validators on every entry"""
+    construct = StudentGroupHTTP.construct
+    groups = []
+    for raw in data:
+        level = educational_level_ru.get(raw["levelEducation"])
+        if level is None:
+            raise ValueError(f"Unknown educational level {raw['levelEducation']!r}")
+        group = construct(id=int(raw["idgruop"]),
+                          direction=str(raw["Codedirection"]),
+                          level=level,
+                          name=str(raw["title"]))
+        groups.append(_sampled(StudentGroupHTTP, raw, group))
+    return groups
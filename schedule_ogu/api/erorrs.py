@@ -29,4 +29,8 @@ class HTTPException(Exception):
         if len(self.text):
             fmt += ': {2}'
 
-        super().__init__(fmt.format(self.response, self.code, self.text))
\ No newline at end of file
+        super().__init__(fmt.format(self.response, self.code, self.text))
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the upstream can not be reached or the circuit breaker is open."""
@@ -23,6 +23,11 @@ __all__: typing.Sequence[str] = ("ScheduleEntryHTTP",
                                  )
 
 
+# Denormalized lecturer names, they are not stored on subjects and exams
+_employee_name_fields = frozenset(("employee_name", "employee_second_name", "employee_middle_name"))
+_exam_skipped_fields = _employee_name_fields | {"id", "photo_link"}
+
+
 class ScheduleEntryHTTP(BaseModel):
     id: str = Field(alias="id_cell")
     name: str = Field(alias="TitleSubject")
@@ -53,6 +58,10 @@ class ScheduleEntryHTTP(BaseModel):
     def parse_date(cls, value):
         return datetime.strptime(value, "%Y-%m-%d").timestamp()
 
+    def db_fields(self) -> dict[str, typing.Any]:
+        """Fields stored on ``ScheduleSubjectModel``, cheaper than ``.dict(exclude=...)``"""
+        return {name: value for name, value in self.__dict__.items() if name not in _employee_name_fields}
+
     @validator("day", pre=True)
     def parse_day_week(cls, value):
         return try_value(DayType, value - 1)
@@ -87,6 +96,12 @@ class ExamHTTP(BaseModel):
     def parse_date(cls, value):
         return datetime.strptime(value, "%d.%m.%Y").timestamp()
 
+    def db_fields(self) -> dict[str, typing.Any]:
+        """Fields stored on ``ExamModel``, cheaper than ``.dict(exclude=...)``, ``id_cell`` becomes ``cell_id``"""
+        fields = {name: value for name, value in self.__dict__.items() if name not in _exam_skipped_fields}
+        fields["cell_id"] = int(self.id)
+        return fields
+
     @validator("day", pre=True)
     def parse_day_week(cls, value):
         return try_value(DayType, value - 1)
@@ -105,6 +120,7 @@ class ScheduleDayHTTP:
 
 class ScheduleHTTP:
     def __init__(self, date: int, entries: typing.List[ScheduleEntryHTTP]):
+        self.date = date
         self.days: dict[DayType, ScheduleDayHTTP] = {day: ScheduleDayHTTP(date, day, []) for day in DayType}
 
         for entry in entries:
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import typing as t
+
+import aiohttp
+
+
+__all__ = ("TransportProfile",)
+
+
+class TransportProfile:
+    def __init__(
+            self,
+            limit: int = 100,
+            limit_per_host: int = 10,
+            keepalive_timeout: float = 30,
+            dns_cache_ttl: int = 300,
+            connect_timeout: float = 5,
+            read_timeout: float = 30,
+            read_timeouts: t.Optional[t.Mapping[str, float]] = None,
+            compression: bool = True
+    ) -> None:
+        """Connection pool, timeout and compression settings of the upstream session
+
+        Parameters
+        ----------
+        limit : int
+            The total amount of pooled connections.
+        limit_per_host : int
+            The amount of pooled connections to a single host, all traffic goes to one host.
+        keepalive_timeout : float
+            How long, in seconds, an idle connection is kept open.
+        dns_cache_ttl : int
+            How long, in seconds, resolved addresses are cached.
+        connect_timeout : float
+            The timeout, in seconds, for opening a connection. Waiting for a free pooled connection is
+            not limited, the request budget already bounds how many requests queue for one.
+        read_timeout : float
+            The timeout, in seconds, between two reads for route families missing from ``read_timeouts``.
+        read_timeouts : Mapping[str, float] | None
+            Read timeouts per route family.
+        compression : bool
+            Whether gzip/deflate encoded responses are requested.
+        """
+        self.limit: int = limit
+        self.limit_per_host: int = limit_per_host
+        self.keepalive_timeout: float = keepalive_timeout
+        self.dns_cache_ttl: int = dns_cache_ttl
+        self.compression: bool = compression
+
+        self._default_timeout = aiohttp.ClientTimeout(total=None,
+                                                      sock_connect=connect_timeout,
+                                                      sock_read=read_timeout)
+        self._timeouts: dict[str, aiohttp.ClientTimeout] = {
+            family: aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=timeout)
+            for family, timeout in (read_timeouts or {}).items()
+        }
+
+    @property
+    def accept_encoding(self) -> str:
+        return "gzip, deflate" if self.compression else "identity"
+
+    def timeout_for(self, family: str) -> aiohttp.ClientTimeout:
+        return self._timeouts.get(family, self._default_timeout)
+
+    def create_session(self, **kwargs: t.Any) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(limit=self.limit,
+                                         limit_per_host=self.limit_per_host,
+                                         keepalive_timeout=self.keepalive_timeout,
+                                         use_dns_cache=True,
+                                         ttl_dns_cache=self.dns_cache_ttl)
+        return aiohttp.ClientSession(connector=connector,
+                                     timeout=self._default_timeout,
+                                     auto_decompress=True,
+                                     **kwargs)
@@ -3,8 +3,14 @@ import json
 
 import aiohttp
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 __all__ = ('flatten_error_dict',
+           "json_loads",
            "json_or_text")
 
 
@@ -26,7 +32,13 @@ def flatten_error_dict(d: t.Dict[str, t.Any], key: str = '') -> t.Dict[str, str]
     return dict(items)
 
 
+def json_loads(raw: t.Union[bytes, str]) -> t.Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
 async def json_or_text(response: aiohttp.ClientResponse) -> t.Union[t.Dict[str, t.Any], str]:
-    if response.headers['content-type'] == 'application/json':
-        return await response.json()
+    if response.headers.get('content-type') == 'application/json':
+        return json_loads(await response.read())
 
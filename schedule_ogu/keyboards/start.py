@@ -1,3 +1,5 @@
+import typing
+
 from aiogram.types import InlineKeyboardMarkup
 from aiogram.filters.callback_data import CallbackData
 from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -11,6 +13,8 @@ start_completed = """
 /start - перезапустить бота (изменить группу)
 /today - расписание на сегодня
 /next - расписание на завтра
+/week - расписание на неделю
+/rooms - свободные аудитории
 """
 
 
@@ -26,8 +30,7 @@ def start_kb_choose_user_type() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-async def start_kb_choose_faculty() -> InlineKeyboardMarkup:
-    faculties = await FacultyModel.all()
+def start_kb_choose_faculty(faculties: typing.Iterable[FacultyModel]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     for faculty in faculties:
@@ -43,8 +46,7 @@ def start_kb_choose_course() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-async def start_kb_choose_department(faculty_id: int) -> InlineKeyboardMarkup:
-    departments = await DepartmentModel.filter(faculty_id=faculty_id)
+def start_kb_choose_department(departments: typing.Iterable[DepartmentModel]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for department in departments:
         builder.button(text=department.short_title, callback_data=UserStartCallback(action="department",
@@ -53,8 +55,7 @@ async def start_kb_choose_department(faculty_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-async def start_kb_choose_group(faculty_id: int, course: int) -> InlineKeyboardMarkup:
-    groups = await GroupModel.filter(faculty_id=faculty_id, course=course)
+def start_kb_choose_group(groups: typing.Iterable[GroupModel]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for group in groups:
         builder.button(text=group.name, callback_data=UserStartCallback(action="group", value=group.id))
@@ -63,8 +64,7 @@ async def start_kb_choose_group(faculty_id: int, course: int) -> InlineKeyboardM
     return builder.as_markup()
 
 
-async def start_kb_choose_employee(department_id: int) -> InlineKeyboardMarkup:
-    employees = await EmployeeModel.filter(department_id=department_id)
+def start_kb_choose_employee(employees: typing.Iterable[EmployeeModel]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for employee in employees:
         builder.button(text=employee.short_full_name, callback_data=UserStartCallback(action="employee",
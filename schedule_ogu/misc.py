@@ -7,10 +7,11 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from loguru import logger
 from tortoise import Tortoise
 
-from config import bot_config, tortoise_config
+from config import bot_config, tortoise_config, UNABLE_ICS_FEED
 from schedule_ogu.models.db import UserModel
-from schedule_ogu.routers import start, schedule
+from schedule_ogu.routers import start, schedule, settings, inline
 from schedule_ogu.services.schedule import ScheduleService
+from schedule_ogu.web import CalendarFeed
 
 
 class DisplayManager:
@@ -51,6 +52,8 @@ async def setup():
 
     dp.include_router(start.router)
     dp.include_router(schedule.router)
+    dp.include_router(settings.router)
+    dp.include_router(inline.router)
 
     if not bot_config.has_display:
         DisplayManager.run_display()
@@ -60,6 +63,13 @@ async def setup():
 
     await ScheduleService.setup(bot)
 
+    if UNABLE_ICS_FEED:
+        feed = CalendarFeed()
+        await feed.start()
+        dp.shutdown.register(feed.stop)
+    # After the feed, it still needs the HTTP client while it stops
+    dp.shutdown.register(ScheduleService.on_shutdown)
+
     if bot_config.superuser_startup_notifier:
         await on_startup_notify(bot)
 
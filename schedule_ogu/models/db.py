@@ -6,7 +6,13 @@ import typing
 from tortoise import fields
 from tortoise.models import Model
 
-from schedule_ogu.models.enums import DayType, EducationalLevel, Years, SubjectType, ActionStats, UserType
+from schedule_ogu.models.enums import (DayType,
+                                       EducationalLevel,
+                                       Years,
+                                       SubjectType,
+                                       ActionStats,
+                                       UserType,
+                                       ObjectKind)
 
 __all__: typing.Sequence[str] = (
     "ScheduleModel",
@@ -15,7 +21,10 @@ __all__: typing.Sequence[str] = (
     "FacultyModel",
     "GroupModel",
     "UserModel",
+    "SubscriptionModel",
+    "DigestRunModel",
     "StatsModel",
+    "FreshnessModel",
     "CookieModel",
     "UserAgentModel",
     "DepartmentModel",
@@ -36,6 +45,23 @@ class StatsModel(Model):
         table_description = "Stores information about the stats"
 
 
+class FreshnessModel(Model):
+    id = fields.IntField(pk=True)
+    action = fields.IntEnumField(ActionStats)
+    kind = fields.IntEnumField(ObjectKind)
+    object_id = fields.BigIntField(default=0)
+    week = fields.BigIntField(default=0)
+    fetched_at = fields.DatetimeField()
+    content_hash = fields.CharField(max_length=40, null=True)
+
+    class Meta:
+        """Metaclass to set table name and description"""
+
+        table = "freshness"
+        table_description = "Stores the last successful fetch of every object"
+        unique_together = ("action", "kind", "object_id", "week")
+
+
 class UserModel(Model):
     id = fields.BigIntField(pk=True, generated=False)
     group_id = fields.IntField(null=True)
@@ -55,6 +81,38 @@ class UserModel(Model):
         return self.employee_id if self.type == UserType.Lecturer else self.group_id
 
 
+class SubscriptionModel(Model):
+    # Same as the id of the user
+    id = fields.BigIntField(pk=True, generated=False)
+    changes = fields.BooleanField(default=False)
+    digest = fields.BooleanField(default=False)
+
+    class Meta:
+        """Metaclass to set table name and description"""
+
+        table = "subscription"
+        table_description = "Stores what the user wants to be notified about"
+
+
+class DigestRunModel(Model):
+    id = fields.IntField(pk=True)
+    date = fields.DateField(unique=True)
+    started_at = fields.DatetimeField(auto_now_add=True)
+    finished_at = fields.DatetimeField(null=True)
+    # The last (type, object_id) that was fully processed, the run resumes after it
+    cursor_type = fields.IntEnumField(UserType, null=True)
+    cursor_object_id = fields.BigIntField(null=True)
+    sent = fields.IntField(default=0)
+    failed = fields.IntField(default=0)
+    skipped = fields.IntField(default=0)
+
+    class Meta:
+        """Metaclass to set table name and description"""
+
+        table = "digest_run"
+        table_description = "Stores the progress of the daily digest"
+
+
 class CookieModel(Model):
     id = fields.BigIntField(pk=True)
     datetime = fields.DatetimeField(auto_now_add=True)
@@ -159,7 +217,7 @@ class EmployeeModel(Model):
 class ScheduleModel(Model):
     id = fields.IntField(pk=True)
     day = fields.IntEnumField(DayType)
-    date = fields.IntField()
+    date = fields.IntField(index=True)
 
     subjects: fields.ForeignKeyRelation[ScheduleSubjectModel]
 
@@ -204,10 +262,14 @@ class ScheduleSubjectModel(Model):
         table = "subject"
         table_description = "Stores information about the subject"
         unique_together = (("schedule_id", "employee_id", "number"), ("schedule_id", "group_id", "number"))
+        # Lessons are looked up by group or lecturer first, the unique keys above lead with the day
+        indexes = (("group_id", "schedule_id"), ("employee_id", "schedule_id"))
 
 
 class ExamModel(Model):
     id = fields.IntField(pk=True)
+    # ``id_cell`` of the upstream, stable across refreshes
+    cell_id = fields.BigIntField(unique=True)
     day = fields.IntEnumField(DayType)
     date = fields.IntField()
 
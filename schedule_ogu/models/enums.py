@@ -6,6 +6,7 @@ __all__ = ("UserType",
            "EducationalLevel",
            "Years",
            "ActionStats",
+           "ObjectKind",
            "SubjectType",
            "subject_type_ru",
            "educational_level_ru",
@@ -54,6 +55,16 @@ class ActionStats(enum.IntEnum):
     fetch_exams = 7
 
 
+class ObjectKind(enum.IntEnum):
+    Catalog = 0
+    Group = 1
+    Employee = 2
+
+    @classmethod
+    def of(cls, user_type: UserType) -> "ObjectKind":
+        return cls.Employee if user_type == UserType.Lecturer else cls.Group
+
+
 class SubjectType(enum.IntEnum):
     lecture = 0
     practice = 1
@@ -64,10 +75,7 @@ class SubjectType(enum.IntEnum):
 
 
 def try_value(cls, value):
-    for name, value_ in cls._member_map_.items():
-        if value_.value == int(value):
-            return cls._member_map_[name]
-    return value
+    return cls._value2member_map_.get(int(value), value)
 
 
 subject_type_ru = {
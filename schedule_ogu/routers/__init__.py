@@ -1,2 +1,4 @@
 from . import schedule
 from . import start
+from . import settings
+from . import inline
@@ -0,0 +1,35 @@
+from aiogram import types, Router
+from aiogram.utils.markdown import hbold
+from loguru import logger
+
+import config
+from schedule_ogu.services.catalog import Catalog
+from schedule_ogu.services.schedule import ScheduleService
+from schedule_ogu.utils.time import ScheduleTime
+
+router = Router()
+
+
+@router.inline_query()
+async def inline_search(query: types.InlineQuery):
+    matches = Catalog.snapshot.search.search(query.query, limit=config.INLINE_RESULTS)
+    day = ScheduleTime.today()
+
+    results = []
+    for entry in matches:
+        # Only what is already rendered, the answer never waits for the database or the upstream
+        preview = ScheduleService.cached_day(entry.user_type, entry.object_id, day)
+        if preview is None:
+            preview = f"{entry.subtitle}\n\nРасписание на сегодня пока не загружено"
+        results.append(types.InlineQueryResultArticle(
+            id=f"{entry.user_type.value}:{entry.object_id}",
+            title=entry.title,
+            description=entry.subtitle,
+            input_message_content=types.InputTextMessageContent(message_text=f"{hbold(entry.title)}\n{preview}",
+                                                                parse_mode="HTML",
+                                                                disable_web_page_preview=True),
+        ))
+
+    logger.info("Inline query {query!r} from {user} matched {count}",
+                query=query.query, user=query.from_user.id, count=len(results))
+    await query.answer(results, cache_time=config.INLINE_CACHE_TIME, is_personal=False)
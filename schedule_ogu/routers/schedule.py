@@ -4,9 +4,10 @@ from aiogram import types
 from aiogram.types import Message
 
 from aiogram import Router
-from aiogram.filters import Text, Command
+from aiogram.filters import Text, Command, CommandObject
 
 from schedule_ogu.services.schedule import ScheduleService
+from schedule_ogu.services.rooms import OccupancyIndex
 from schedule_ogu.models.db import UserModel
 from schedule_ogu.models.enums import DayType
 from schedule_ogu.utils.render import RendererSchedule
@@ -34,17 +35,16 @@ async def send_schedule(message: types.Message, day: DayType, future: bool = Fal
             week_delta += 1
 
         ...
-        schedule = await ScheduleService.get_schedule(user, week_delta=week_delta)
-        await message.reply(RendererSchedule.render_day(user=user, schedule=schedule, day=day),
-                            disable_web_page_preview=True)
+        text = await ScheduleService.render_day(user, day, week_delta=week_delta)
+        await message.reply(text, disable_web_page_preview=True)
 
 
 async def send_exams(message: types.Message):
     user = await user_in_db(message)
     if not user:
         return
-    await message.reply(RendererSchedule.render_exams(user, await ScheduleService.get_exams(user)),
-                        disable_web_page_preview=True)
+    text = await ScheduleService.render_exams(user)
+    await message.reply(text, disable_web_page_preview=True)
 
 
 @router.message(Command(commands=['previous', 'вчера']))
@@ -116,16 +116,43 @@ async def friday(message: types.Message):
 async def saturday(message: types.Message):
     await send_schedule(message, DayType.Saturday)
 
-# @router.message(Command(commands=['week', 'Week', 'неделя', 'Неделя']))
-# async def week(message: types.Message):
-#     schedule: typing.List[ScheduleSubjectModel] = await get_schedule(message)
-#     data = {}
-#     for day in DayType:
-#         data[day] = []
-#     for day_schedule in schedule:
-#         data[day_schedule.day].append(day_schedule)
-#     logger.warning(data)
-#     for data_ in data.values():
-#         await message.reply(RendererSchedule.render_day(data_),
-#                             parse_mode=types.ParseMode.HTML,
-#                             disable_web_page_preview=True)
+
+@router.message(Command(commands=['week', 'Week', 'неделя', 'Неделя']))
+async def cmd_week(message: types.Message):
+    user = await user_in_db(message)
+    if not user:
+        return
+    schedule = await ScheduleService.get_schedule(user)
+    messages = RendererSchedule.render_week(user, schedule)
+    if schedule.stale and messages:
+        messages[-1] += f"\n\n{RendererSchedule.stale_notice}"
+    for text in messages:
+        await message.reply(text, disable_web_page_preview=True)
+
+
+rooms_usage = "Использование: /rooms <корпус> <пара>, например /rooms 11 3 или /rooms 11 3-4"
+
+
+def parse_pairs(text: str) -> list[int] | None:
+    first, _, last = text.partition("-")
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+    numbers = list(range(int(first), int(last or first) + 1))
+    if not numbers or any(number not in RendererSchedule.times for number in numbers):
+        return None
+    return numbers
+
+
+@router.message(Command(commands=['rooms', 'аудитории']))
+async def cmd_rooms(message: types.Message, command: CommandObject):
+    args = (command.args or "").split()
+    numbers = parse_pairs(args[1]) if len(args) == 2 and args[0].isdigit() else None
+    if numbers is None or int(args[0]) not in OccupancyIndex.buildings():
+        buildings = ", ".join(map(str, OccupancyIndex.buildings()))
+        await message.reply(f"{rooms_usage}\nКорпуса: {buildings}")
+        return
+
+    today = datetime.date.today()
+    rooms = OccupancyIndex.free(int(args[0]), today, numbers)
+    await message.reply(RendererSchedule.render_free_rooms(int(args[0]), today.strftime("%d.%m.%Y"), numbers,
+                                                           rooms or []))
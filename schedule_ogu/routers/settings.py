@@ -0,0 +1,45 @@
+from aiogram import types, Router
+from aiogram.filters import Command
+from loguru import logger
+
+import config
+
+from schedule_ogu.models.db import UserModel, SubscriptionModel
+
+router = Router()
+
+
+@router.message(Command(commands=["notify", "уведомления"]))
+async def cmd_notify(message: types.Message):
+    if not await UserModel.exists(id=message.from_user.id):
+        await message.reply("Используйте команду /start.")
+        return
+
+    subscription, _ = await SubscriptionModel.get_or_create(id=message.from_user.id)
+    subscription.changes = not subscription.changes
+    await subscription.save(update_fields=["changes"])
+    logger.info("User {user} set change notifications to {value}", user=message.from_user.id,
+                value=subscription.changes)
+
+    if subscription.changes:
+        await message.reply("Уведомления об изменениях в расписании включены. Отключить: /notify")
+    else:
+        await message.reply("Уведомления об изменениях в расписании отключены. Включить: /notify")
+
+
+@router.message(Command(commands=["digest", "рассылка"]))
+async def cmd_digest(message: types.Message):
+    if not await UserModel.exists(id=message.from_user.id):
+        await message.reply("Используйте команду /start.")
+        return
+
+    subscription, _ = await SubscriptionModel.get_or_create(id=message.from_user.id)
+    subscription.digest = not subscription.digest
+    await subscription.save(update_fields=["digest"])
+    logger.info("User {user} set the digest to {value}", user=message.from_user.id, value=subscription.digest)
+
+    if subscription.digest:
+        await message.reply(f"Расписание на день будет приходить каждое утро в "
+                            f"{config.DIGEST_TIME.strftime('%H:%M')}. Отключить: /digest")
+    else:
+        await message.reply("Утренняя рассылка расписания отключена. Включить: /digest")
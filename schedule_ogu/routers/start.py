@@ -10,6 +10,7 @@ from schedule_ogu.keyboards import start
 from schedule_ogu.keyboards.commands import commands_kb
 from schedule_ogu.models.db import UserModel
 from schedule_ogu.models.enums import UserType
+from schedule_ogu.services.catalog import Catalog
 
 router = Router()
 
@@ -54,12 +55,15 @@ async def cmd_help(message: types.Message):
         hbold("Здесь ты можешь увидить список моих команд:"),
         "{command} - Получите это сообщение".format(command="/help"),
         "{command} - My version".format(command="/version"),
+        "{command} - Свободные аудитории корпуса на паре".format(command="/rooms"),
         "",
     ]
 
     if message.chat.type == "private":
         text.extend([hbold("Доступно только в лс:"),
                      "{command} - Начните разговор с ботом".format(command="/start"),
+                     "{command} - Уведомления об изменениях в расписании".format(command="/notify"),
+                     "{command} - Расписание на день каждое утро".format(command="/digest"),
                      "",
                      ])
     await message.reply("\n".join(text))
@@ -78,7 +82,7 @@ async def cq_start_choose_user_type(
     )
     await state.update_data(user_type=callback_data.value)
     await state.set_state(StartForm.faculty)
-    markup = await start.start_kb_choose_faculty()
+    markup = Catalog.snapshot.faculty_markup
     await callback.message.edit_text("Выберите факультет", reply_markup=markup)
 
 
@@ -101,7 +105,7 @@ async def cq_start_choose_faculty(
         await callback.message.edit_text("Выберите курс", reply_markup=markup)
     else:
         await state.set_state(StartForm.department)
-        markup = await start.start_kb_choose_department(int(callback_data.value))
+        markup = Catalog.snapshot.department_markup(int(callback_data.value))
         await callback.message.edit_text("Выберите кафедру", reply_markup=markup)
 
 
@@ -120,7 +124,7 @@ async def cq_start_choose_course(
     await state.update_data(course=callback_data.value)
     data = await state.get_data()
     await state.set_state(StartForm.group)
-    markup = await start.start_kb_choose_group(data["faculty"], int(callback_data.value))
+    markup = Catalog.snapshot.group_markup(int(data["faculty"]), int(callback_data.value))
     await callback.message.edit_text("Выберите группу", reply_markup=markup)
 
 
@@ -158,7 +162,7 @@ async def cq_start_choose_department(
     )
     await state.update_data(department=callback_data.value)
     await state.set_state(StartForm.employee)
-    markup = await start.start_kb_choose_employee(int(callback_data.value))
+    markup = Catalog.snapshot.employee_markup(int(callback_data.value))
     await callback.message.edit_text("Найдите себя", reply_markup=markup)
 
 
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import typing as t
+from types import MappingProxyType
+
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+
+from schedule_ogu.keyboards import start
+from schedule_ogu.models.db import FacultyModel, DepartmentModel, GroupModel, EmployeeModel
+from schedule_ogu.models.enums import UserType
+from schedule_ogu.utils.search import SearchEntry, SearchIndex
+
+
+__all__ = ("Catalog",
+           "CatalogSnapshot",
+           )
+
+K = t.TypeVar("K")
+V = t.TypeVar("V")
+
+_empty_markup = InlineKeyboardMarkup(inline_keyboard=[])
+
+
+def _grouped(items: t.Iterable[V], key: t.Callable[[V], K]) -> t.Mapping[K, tuple[V, ...]]:
+    groups: dict[K, list[V]] = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+
+class CatalogSnapshot:
+    def __init__(
+            self,
+            faculties: t.Iterable[FacultyModel],
+            departments: t.Iterable[DepartmentModel],
+            groups: t.Iterable[GroupModel],
+            employees: t.Iterable[EmployeeModel]
+    ) -> None:
+        """Read-only view of faculties, departments, groups and employees with their registration keyboards
+        and the search index over group and lecturer names
+
+        Never changed after it is built, a catalog refresh builds a new one and swaps it in.
+        """
+        self.faculties: tuple[FacultyModel, ...] = tuple(faculties)
+        self.departments: t.Mapping[int, tuple[DepartmentModel, ...]] = _grouped(departments,
+                                                                                 lambda d: d.faculty_id)
+        self.groups: t.Mapping[tuple[int, int], tuple[GroupModel, ...]] = _grouped(groups,
+                                                                                   lambda g: (g.faculty_id,
+                                                                                              int(g.course)))
+        self.employees: t.Mapping[int, tuple[EmployeeModel, ...]] = _grouped(employees, lambda e: e.department_id)
+
+        self.search: SearchIndex = self._build_search()
+        self.titles: t.Mapping[tuple[UserType, int], str] = MappingProxyType({(entry.user_type, entry.object_id):
+                                                                              entry.title
+                                                                              for entry in self.search.entries})
+
+        self.faculty_markup: InlineKeyboardMarkup = start.start_kb_choose_faculty(self.faculties)
+        self._department_markups = MappingProxyType({faculty_id: start.start_kb_choose_department(items)
+                                                     for faculty_id, items in self.departments.items()})
+        self._group_markups = MappingProxyType({key: start.start_kb_choose_group(items)
+                                                for key, items in self.groups.items()})
+        self._employee_markups = MappingProxyType({department_id: start.start_kb_choose_employee(items)
+                                                   for department_id, items in self.employees.items()})
+
+    def _build_search(self) -> SearchIndex:
+        faculties = {faculty.id: faculty for faculty in self.faculties}
+        departments = {department.id: department
+                       for items in self.departments.values() for department in items}
+
+        entries = []
+        for (faculty_id, course), groups in self.groups.items():
+            faculty = faculties.get(faculty_id)
+            subtitle = f"{faculty.short_title}, {course} курс" if faculty else f"{course} курс"
+            entries.extend(SearchEntry(UserType.Student, group.id, group.name, subtitle) for group in groups)
+        for department_id, employees in self.employees.items():
+            department = departments.get(department_id)
+            subtitle = department.short_title if department else ""
+            entries.extend(SearchEntry(UserType.Lecturer,
+                                       employee.id,
+                                       f"{employee.second_name} {employee.name} {employee.middle_name}",
+                                       subtitle) for employee in employees)
+        return SearchIndex(entries)
+
+    @classmethod
+    async def load(cls) -> CatalogSnapshot:
+        return cls(await FacultyModel.all(),
+                   await DepartmentModel.all(),
+                   await GroupModel.all(),
+                   await EmployeeModel.all())
+
+    def department_markup(self, faculty_id: int) -> InlineKeyboardMarkup:
+        return self._department_markups.get(faculty_id, _empty_markup)
+
+    def group_markup(self, faculty_id: int, course: int) -> InlineKeyboardMarkup:
+        return self._group_markups.get((faculty_id, course), _empty_markup)
+
+    def employee_markup(self, department_id: int) -> InlineKeyboardMarkup:
+        return self._employee_markups.get(department_id, _empty_markup)
+
+
+class Catalog:
+    snapshot: CatalogSnapshot = CatalogSnapshot((), (), (), ())
+
+    @classmethod
+    async def refresh(cls) -> None:
+        """Loads a new snapshot and swaps it in, readers keep whichever snapshot they already hold"""
+        snapshot = await CatalogSnapshot.load()
+        cls.snapshot = snapshot
+        logger.info("Catalog snapshot loaded: {} faculties, {} groups",
+                    len(snapshot.faculties), sum(len(groups) for groups in snapshot.groups.values()))
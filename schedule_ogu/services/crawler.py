@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import typing as t
+
+from loguru import logger
+
+import config
+from schedule_ogu.api import HTTPClient
+from schedule_ogu.api.models import FacultyHTTP, DepartmentHTTP, EmployeeHTTP, StudentGroupHTTP
+from schedule_ogu.models.enums import Years
+
+
+__all__ = ("CatalogCrawler",
+           "CatalogCrawlResult",
+           )
+
+K = t.TypeVar("K")
+V = t.TypeVar("V")
+
+
+class CatalogCrawlResult:
+    """Everything a single catalog crawl managed to fetch.
+
+    Subtrees that kept failing after all retries are listed in ``failed`` as
+    ``(stage, key)`` pairs, everything else is kept even when the crawl is partial.
+    """
+
+    def __init__(self) -> None:
+        self.faculties: t.Optional[list[FacultyHTTP]] = None
+        self.departments: dict[int, list[DepartmentHTTP]] = {}
+        self.employees: dict[int, list[EmployeeHTTP]] = {}
+        self.groups: dict[tuple[int, Years], list[StudentGroupHTTP]] = {}
+        self.failed: set[tuple[str, t.Any]] = set()
+        self.timings: dict[str, float] = {}
+
+    @property
+    def complete(self) -> bool:
+        return self.faculties is not None and not self.failed
+
+
+class CatalogCrawler:
+    def __init__(
+            self,
+            http: HTTPClient,
+            concurrency: int = config.CRAWLER_CONCURRENCY,
+            retries: int = config.CRAWLER_RETRIES,
+            on_progress: t.Optional[t.Callable[[str, int, int], t.Any]] = None
+    ) -> None:
+        """Walks faculties → departments → employees and faculties → groups concurrently
+
+        Parameters
+        ----------
+        http : HTTPClient
+            The client used for upstream calls.
+        concurrency : int
+            The maximum amount of requests in flight at once.
+        retries : int
+            How many extra rounds failed subtrees get before they are given up.
+        on_progress : Callable[[str, int, int], Any] | None
+            Called with ``(stage, done, total)`` after every finished call.
+        """
+        self.http: HTTPClient = http
+        self.concurrency: int = concurrency
+        self.retries: int = retries
+        self.on_progress = on_progress
+
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+
+    async def crawl(self) -> CatalogCrawlResult:
+        result = CatalogCrawlResult()
+        started = time.perf_counter()
+
+        faculties = await self._run_stage(result, "faculties", [0], lambda _: self.http.get_faculties())
+        if 0 not in faculties:
+            logger.error("Catalog crawl aborted, faculties are unreachable")
+            return result
+        result.faculties = faculties[0]
+        faculty_ids = [faculty.id for faculty in result.faculties]
+
+        await asyncio.gather(self._crawl_departments(result, faculty_ids),
+                             self._crawl_groups(result, faculty_ids))
+
+        result.timings["total"] = time.perf_counter() - started
+        logger.info("Catalog crawl finished in {:.2f}s, stages: {}, failed subtrees: {}",
+                    result.timings["total"],
+                    {stage: round(elapsed, 2) for stage, elapsed in result.timings.items() if stage != "total"},
+                    len(result.failed))
+        return result
+
+    async def _crawl_departments(self, result: CatalogCrawlResult, faculty_ids: list[int]) -> None:
+        result.departments = await self._run_stage(result, "departments", faculty_ids, self.http.get_departments)
+        department_ids = [department.id for departments in result.departments.values() for department in departments]
+        result.employees = await self._run_stage(result, "employees", department_ids, self.http.get_employees)
+
+    async def _crawl_groups(self, result: CatalogCrawlResult, faculty_ids: list[int]) -> None:
+        keys = [(faculty_id, course) for faculty_id in faculty_ids for course in Years]
+        result.groups = await self._run_stage(result, "groups", keys, lambda key: self.http.get_groups(*key))
+
+    async def _run_stage(
+            self,
+            result: CatalogCrawlResult,
+            stage: str,
+            keys: t.Sequence[K],
+            fetch: t.Callable[[K], t.Awaitable[V]]
+    ) -> dict[K, V]:
+        started = time.perf_counter()
+        fetched: dict[K, V] = {}
+        pending: list[K] = list(dict.fromkeys(keys))
+        total = len(pending)
+
+        async def call(key: K) -> V:
+            async with self._semaphore:
+                data = await fetch(key)
+            fetched[key] = data
+            if self.on_progress is not None:
+                self.on_progress(stage, len(fetched), total)
+            return data
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                logger.warning("Retrying {} failed {} subtrees (attempt {})", len(pending), stage, attempt)
+                await asyncio.sleep(1 + (attempt - 1) * 2)
+
+            outcomes = await asyncio.gather(*(call(key) for key in pending), return_exceptions=True)
+
+            failed: list[K] = []
+            for key, outcome in zip(pending, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.debug("Crawler {} {} failed: {!r}", stage, key, outcome)
+                    failed.append(key)
+
+            pending = failed
+            if not pending:
+                break
+
+        result.failed.update((stage, key) for key in pending)
+        result.timings[stage] = time.perf_counter() - started
+        logger.info("Crawler stage {} fetched {}/{} in {:.2f}s", stage, len(fetched), total, result.timings[stage])
+        return fetched
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import typing as t
+from datetime import datetime, date as ddate, time as dtime, timedelta
+
+import pytz
+from loguru import logger
+from tortoise.expressions import Subquery
+
+import config
+from schedule_ogu.models.db import UserModel, SubscriptionModel, DigestRunModel, ScheduleModel
+from schedule_ogu.models.enums import DayType, UserType
+from schedule_ogu.utils.render import RendererSchedule
+from schedule_ogu.utils.sender import ThrottledSender
+
+
+__all__ = ("DigestJob",)
+
+
+class DigestJob:
+    def __init__(
+            self,
+            sender: ThrottledSender,
+            load_schedule: t.Callable[[UserModel], t.Awaitable[t.Mapping[DayType, ScheduleModel]]],
+            timezone: str = config.DIGEST_TIMEZONE,
+            at: dtime = config.DIGEST_TIME,
+            deadline: dtime = config.DIGEST_DEADLINE,
+            page_size: int = 1000
+    ) -> None:
+        """Sends the schedule of the day to every user subscribed to the digest
+
+        Users are streamed grouped by group or lecturer, every schedule is loaded and rendered once
+        per group. Progress is stored after every group, so a run interrupted by a restart resumes
+        where it stopped instead of sending everything twice.
+
+        Parameters
+        ----------
+        sender : ThrottledSender
+            Sends the messages within Telegram limits.
+        load_schedule : Callable[[UserModel], Awaitable[Mapping[DayType, ScheduleModel]]]
+            Loads the stored schedule of the current week for a user.
+        timezone : str
+            The timezone ``at`` and ``deadline`` are given in.
+        at : time
+            When the digest goes out.
+        deadline : time
+            An unfinished run is only resumed before this moment.
+        page_size : int
+            How many users are read at once.
+        """
+        self.sender: ThrottledSender = sender
+        self.load_schedule = load_schedule
+        self.timezone = pytz.timezone(timezone)
+        self.at: dtime = at
+        self.deadline: dtime = deadline
+        self.page_size: int = page_size
+
+        self._task: t.Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        while True:
+            now = datetime.now(self.timezone)
+            try:
+                if now.weekday() != 6 and self.at <= now.time() < self.deadline:
+                    digest = await DigestRunModel.get_or_none(date=now.date())
+                    if digest is None or digest.finished_at is None:
+                        await self.send(now.date(), digest)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Digest failed: {}", e)
+                await asyncio.sleep(60)
+                continue
+
+            await asyncio.sleep((self.next_run(datetime.now(self.timezone)) - datetime.now(self.timezone))
+                                .total_seconds())
+
+    def next_run(self, now: datetime) -> datetime:
+        day = now.date()
+        while True:
+            at = self.timezone.localize(datetime.combine(day, self.at))
+            if at > now and at.weekday() != 6:
+                return at
+            day += timedelta(days=1)
+
+    async def send(self, date: ddate, digest: t.Optional[DigestRunModel] = None) -> DigestRunModel:
+        if digest is None:
+            digest = await DigestRunModel.create(date=date)
+        else:
+            logger.info("Resuming the digest for {} after {} {}", date, digest.cursor_type, digest.cursor_object_id)
+
+        day = DayType(date.weekday())
+        async for (user_type, object_id), users in self._groups(digest):
+            try:
+                schedule = await self.load_schedule(users[0])
+                schedule_day = schedule.get(day)
+                if schedule_day is None or not schedule_day.subjects:
+                    digest.skipped += len(users)
+                else:
+                    text = RendererSchedule.render_day(users[0], schedule, day)
+                    sent = await asyncio.gather(*(self.sender.send(user.id, text, disable_web_page_preview=True)
+                                                  for user in users))
+                    digest.sent += sum(sent)
+                    digest.failed += len(sent) - sum(sent)
+            except Exception as e:
+                logger.exception("Digest for {} {} failed: {}", user_type.name, object_id, e)
+                digest.failed += len(users)
+
+            digest.cursor_type = user_type
+            digest.cursor_object_id = object_id
+            await digest.save(update_fields=["cursor_type", "cursor_object_id", "sent", "failed", "skipped"])
+
+        digest.finished_at = datetime.utcnow()
+        await digest.save(update_fields=["finished_at"])
+        logger.info("Digest for {} sent to {} users, {} failed, {} skipped",
+                    date, digest.sent, digest.failed, digest.skipped)
+        return digest
+
+    async def _groups(
+            self,
+            digest: DigestRunModel
+    ) -> t.AsyncIterator[tuple[tuple[UserType, int], list[UserModel]]]:
+        """Subscribed users grouped by ``(type, object_id)`` in order, starting after the cursor of ``digest``"""
+        subscribed = Subquery(SubscriptionModel.filter(digest=True).values("id"))
+        for user_type, field in ((UserType.Student, "group_id"), (UserType.Lecturer, "employee_id")):
+            if digest.cursor_type is not None and digest.cursor_type > user_type:
+                continue
+
+            query = UserModel.filter(id__in=subscribed, type=user_type, **{f"{field}__isnull": False})
+            if digest.cursor_type == user_type:
+                query = query.filter(**{f"{field}__gt": digest.cursor_object_id})
+            query = query.order_by(field, "id")
+
+            key, users = None, []
+            offset = 0
+            while True:
+                page = await query.offset(offset).limit(self.page_size)
+                offset += len(page)
+                for user in page:
+                    if (user.type, user.object_id) != key:
+                        if users:
+                            yield key, users
+                        key, users = (user.type, user.object_id), []
+                    users.append(user)
+                if len(page) < self.page_size:
+                    break
+            if users:
+                yield key, users
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
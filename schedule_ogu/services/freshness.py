@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import hashlib
+import typing as t
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from schedule_ogu.models.db import FreshnessModel
+from schedule_ogu.models.enums import ActionStats, ObjectKind
+
+
+__all__ = ("FreshnessKey",
+           "FreshnessEntry",
+           "FreshnessRegistry",
+           "content_hash",
+           )
+
+
+class FreshnessKey(t.NamedTuple):
+    action: ActionStats
+    kind: ObjectKind = ObjectKind.Catalog
+    object_id: int = 0
+    # Start of the week for schedules, 0 for everything fetched as a whole
+    week: int = 0
+
+
+class FreshnessEntry(t.NamedTuple):
+    fetched_at: datetime
+    content_hash: t.Optional[str]
+
+
+def content_hash(rows: t.Iterable[t.Iterable[t.Any]]) -> str:
+    """Order independent hash of normalised rows"""
+    digest = hashlib.sha1()
+    for row in sorted(repr(tuple(row)) for row in rows):
+        digest.update(row.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+class FreshnessRegistry:
+    """Last successful fetch time and content hash per fetched object.
+
+    Backed by the ``freshness`` table, which is written in the same transaction as the data,
+    and mirrored in memory so freshness checks never hit the database.
+    """
+
+    _entries: dict[FreshnessKey, FreshnessEntry] = {}
+
+    @classmethod
+    async def load(cls) -> None:
+        cls._entries = {FreshnessKey(row.action, row.kind, row.object_id, row.week): FreshnessEntry(
+            row.fetched_at if row.fetched_at.tzinfo else row.fetched_at.replace(tzinfo=timezone.utc),
+            row.content_hash
+        ) for row in await FreshnessModel.all()}
+        logger.info("Loaded {} freshness entries", len(cls._entries))
+
+    @classmethod
+    def get(cls, key: FreshnessKey) -> t.Optional[FreshnessEntry]:
+        return cls._entries.get(key)
+
+    @classmethod
+    def is_stale(cls, key: FreshnessKey, ttl: timedelta, at: t.Optional[datetime] = None) -> bool:
+        """Whether ``key`` was never fetched or is older than ``ttl`` at the moment ``at``, now by default"""
+        entry = cls._entries.get(key)
+        return entry is None or entry.fetched_at < (at or datetime.now(timezone.utc)) - ttl
+
+    @classmethod
+    async def mark(
+            cls,
+            entries: t.Mapping[FreshnessKey, t.Optional[str]],
+            using_db: t.Optional[BaseDBAsyncClient] = None
+    ) -> dict[FreshnessKey, FreshnessEntry]:
+        """Records a successful fetch of every key with its content hash, in a single statement
+
+        Within a transaction (``using_db``) the in-memory mirror is left alone, a rollback would leave it
+        ahead of the table. Pass the returned entries to ``remember`` once the transaction committed.
+        """
+        if not entries:
+            return {}
+
+        now = datetime.now(timezone.utc)
+        await FreshnessModel.bulk_create([FreshnessModel(action=key.action,
+                                                         kind=key.kind,
+                                                         object_id=key.object_id,
+                                                         week=key.week,
+                                                         fetched_at=now,
+                                                         content_hash=digest) for key, digest in entries.items()],
+                                         on_conflict=("action", "kind", "object_id", "week"),
+                                         update_fields=("fetched_at", "content_hash"),
+                                         using_db=using_db)
+
+        marked = {key: FreshnessEntry(now, digest) for key, digest in entries.items()}
+        if using_db is None:
+            cls.remember(marked)
+        return marked
+
+    @classmethod
+    def remember(cls, entries: t.Mapping[FreshnessKey, FreshnessEntry]) -> None:
+        cls._entries.update(entries)
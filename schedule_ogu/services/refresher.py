@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+import typing as t
+from datetime import datetime, timedelta, time as dtime
+
+import pytz
+from loguru import logger
+
+import config
+from schedule_ogu.models.db import UserModel
+from schedule_ogu.models.enums import ActionStats, ObjectKind, UserType
+from schedule_ogu.services.freshness import FreshnessRegistry, FreshnessKey
+from schedule_ogu.utils.time import ScheduleTime
+
+
+__all__ = ("RefreshScheduler",
+           "RefreshPhase",
+           )
+
+
+class RefreshPhase(t.NamedTuple):
+    name: str
+    # Schedules stale by this moment are refreshed in the phase
+    due_at: datetime
+    ends_at: datetime
+
+
+class RefreshScheduler:
+    def __init__(
+            self,
+            refresh: t.Callable[[UserModel, int], t.Awaitable[bool]],
+            ttl: timedelta = config.UPDATE_FETCH_SCHEDULE,
+            timezone: str = config.REFRESH_TIMEZONE,
+            first_lesson: dtime = config.REFRESH_FIRST_LESSON,
+            warmup: timedelta = config.REFRESH_WARMUP,
+            warmup_end: dtime = config.REFRESH_WARMUP_END,
+            day_end: dtime = config.REFRESH_DAY_END,
+            lead: timedelta = config.REFRESH_LEAD,
+            weeks: t.Sequence[int] = config.REFRESH_WEEKS,
+            hourly_budget: int = config.REFRESH_HOURLY_BUDGET,
+            access_half_life: timedelta = config.REFRESH_ACCESS_HALF_LIFE
+    ) -> None:
+        """Keeps schedules of groups and lecturers fresh before anyone asks for them
+
+        Every round collects the (object, week) pairs that will be stale by the end of the current phase
+        into a priority queue and refreshes them most popular first, spaced evenly over the phase.
+        Popularity is the amount of registered users, boosted by how recently the object was looked at.
+
+        Parameters
+        ----------
+        refresh : Callable[[UserModel, int], Awaitable[bool]]
+            Fetches and saves a week of a user's schedule, returns whether it succeeded.
+        ttl : timedelta
+            How long a fetched week stays fresh.
+        timezone : str
+            The timezone lesson times are given in.
+        first_lesson : time
+            When the first lesson starts, the warmup refreshes everything that would be stale by then.
+        warmup : timedelta
+            How long the warmup lasts.
+        warmup_end : time
+            When the warmup is over and the day starts, no later than ``first_lesson``.
+        day_end : time
+            Nothing is refreshed from this moment until the next warmup.
+        lead : timedelta
+            During the day, schedules are refreshed this long before they get stale.
+        weeks : Sequence[int]
+            Week deltas kept fresh for every object.
+        hourly_budget : int
+            The maximum amount of refreshes per hour.
+        access_half_life : timedelta
+            How fast the boost from a recent access fades.
+        """
+        self.refresh = refresh
+        self.ttl: timedelta = ttl
+        self.timezone = pytz.timezone(timezone)
+        self.first_lesson: dtime = first_lesson
+        self.warmup: timedelta = warmup
+        self.warmup_end: dtime = warmup_end
+        self.day_end: dtime = day_end
+        self.lead: timedelta = lead
+        self.weeks: t.Sequence[int] = weeks
+        self.min_interval: float = 3600 / hourly_budget
+        self.access_half_life: float = access_half_life.total_seconds()
+
+        self.refreshed: int = 0
+        self.failed: int = 0
+
+        self._accessed: dict[tuple[UserType, int], float] = {}
+        self._task: t.Optional[asyncio.Task] = None
+
+    def touch(self, user_type: UserType, object_id: int) -> None:
+        """Records that someone looked at the schedule of a group or lecturer"""
+        self._accessed[(user_type, object_id)] = time.time()
+
+    def priority(self, user_type: UserType, object_id: int, users: int) -> float:
+        accessed = self._accessed.get((user_type, object_id))
+        recency = 0.5 ** ((time.time() - accessed) / self.access_half_life) if accessed else 0
+        return users * (1 + recency)
+
+    def phase(self, now: datetime) -> t.Optional[RefreshPhase]:
+        """The refresh phase ``now`` falls into, None at night and on Sundays"""
+        if now.weekday() == 6:
+            return None
+
+        first_lesson = self.timezone.localize(datetime.combine(now.date(), self.first_lesson))
+        warmup_end = self.timezone.localize(datetime.combine(now.date(), self.warmup_end))
+        day_end = self.timezone.localize(datetime.combine(now.date(), self.day_end))
+        if warmup_end - self.warmup <= now < warmup_end:
+            return RefreshPhase("warmup", first_lesson, warmup_end)
+        if warmup_end <= now < day_end:
+            return RefreshPhase("day", now + self.lead, min(now + self.lead, day_end))
+        return None
+
+    def next_warmup(self, now: datetime) -> datetime:
+        day = now.date()
+        while True:
+            start = self.timezone.localize(datetime.combine(day, self.warmup_end)) - self.warmup
+            if start > now and start.weekday() != 6:
+                return start
+            day += timedelta(days=1)
+
+    async def plan(self, due_at: datetime) -> list[tuple[float, int, int, UserType, UserModel]]:
+        """Heap of ``(-priority, object_id, week_delta, user_type, user)`` stale by ``due_at``"""
+        objects: dict[tuple[UserType, int], tuple[UserModel, int]] = {}
+        for user in await UserModel.all():
+            if user.object_id is None:
+                continue
+            representative, users = objects.get((user.type, user.object_id), (user, 0))
+            objects[(user.type, user.object_id)] = (representative, users + 1)
+
+        weeks = {week: ScheduleTime.compute_timestamp(week) for week in self.weeks}
+        queue = []
+        for (user_type, object_id), (user, users) in objects.items():
+            priority = self.priority(user_type, object_id, users)
+            for week, timestamp in weeks.items():
+                key = FreshnessKey(ActionStats.fetch_schedule, ObjectKind.of(user_type), object_id, timestamp)
+                if FreshnessRegistry.is_stale(key, self.ttl, at=due_at):
+                    queue.append((-priority, object_id, week, user_type, user))
+
+        heapq.heapify(queue)
+        return queue
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._round()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Refresh round failed: {}", e)
+                await asyncio.sleep(60)
+
+    async def _round(self) -> None:
+        now = datetime.now(self.timezone)
+        phase = self.phase(now)
+        if phase is None:
+            await asyncio.sleep((self.next_warmup(now) - now).total_seconds())
+            return
+
+        queue = await self.plan(phase.due_at)
+        window = (phase.ends_at - now).total_seconds()
+        if not queue:
+            await asyncio.sleep(min(window, self.lead.total_seconds()))
+            return
+
+        # Spread evenly over the phase, whatever does not fit the budget is left to on-demand fetches
+        interval = max(window / len(queue), self.min_interval)
+        logger.info("Refreshing {} schedules in the {} phase, one every {:.1f}s", len(queue), phase.name, interval)
+
+        started = time.monotonic()
+        while queue and time.monotonic() - started < window:
+            _, object_id, week, user_type, user = heapq.heappop(queue)
+            key = FreshnessKey(ActionStats.fetch_schedule,
+                               ObjectKind.of(user_type),
+                               object_id,
+                               ScheduleTime.compute_timestamp(week))
+            # Somebody could have asked for it in the meantime
+            if not FreshnessRegistry.is_stale(key, self.ttl, at=phase.due_at):
+                continue
+
+            if await self.refresh(user, week):
+                self.refreshed += 1
+            else:
+                self.failed += 1
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
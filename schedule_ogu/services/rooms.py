@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import re
+import typing as t
+from datetime import date as ddate, timedelta
+
+from loguru import logger
+
+from schedule_ogu.models.db import ScheduleSubjectModel
+from schedule_ogu.utils.render import RendererSchedule
+from schedule_ogu.utils.time import ScheduleTime
+
+
+__all__ = ("RoomLesson",
+           "OccupancyIndex",
+           )
+
+# Bits per day in a room bitset, one per lesson number
+SLOTS_PER_DAY = max(RendererSchedule.times)
+
+_digits = re.compile(r"(\d+)")
+
+
+def _natural(audience: str) -> tuple:
+    return tuple(int(part) if part.isdigit() else part for part in _digits.split(audience))
+
+
+class RoomLesson(t.NamedTuple):
+    """A stored lesson as the occupancy index sees it, lessons are unique per day, number and lecturer"""
+
+    date: ddate
+    number: int
+    employee_id: int
+    building: int
+    audience: str
+
+    @classmethod
+    def from_row(cls, row: t.Mapping[str, t.Any]) -> RoomLesson:
+        """From ``ScheduleSubjectModel.values()`` with ``schedule__date``"""
+        return cls(ScheduleTime.date_of(row["schedule__date"]),
+                   row["number"],
+                   row["employee_id"],
+                   row["building"],
+                   row["audience"])
+
+    @classmethod
+    def from_model(cls, subject: ScheduleSubjectModel, date: int) -> RoomLesson:
+        """``date`` is the ``ScheduleModel.date`` of the lesson's day"""
+        return cls(ScheduleTime.date_of(date),
+                   subject.number,
+                   subject.employee_id,
+                   subject.building,
+                   subject.audience)
+
+    @property
+    def room(self) -> tuple[int, str]:
+        return self.building, self.audience
+
+
+class OccupancyIndex:
+    """Which rooms are taken when, from the current week on.
+
+    Every room has one bitset over ``(day, lesson number)`` slots counted from the Monday of the current
+    week, so finding free rooms is a mask test per room. Saved weeks replace their lessons in place,
+    the bitsets are shifted as weeks pass.
+    """
+
+    _origin: ddate = ddate.min
+    # building -> audience -> bitset
+    _rooms: dict[int, dict[str, int]] = {}
+    # (day, number) -> lecturer -> room, a bit is cleared only when no lesson is left in the room
+    _slots: dict[tuple[ddate, int], dict[int, tuple[int, str]]] = {}
+
+    @classmethod
+    async def load(cls) -> None:
+        cls._origin = cls._week_start(ddate.today())
+        cls._rooms = {}
+        cls._slots = {}
+
+        # Every room ever used, so rooms without lessons this week still show up as free
+        for row in await ScheduleSubjectModel.all().distinct().values("building", "audience"):
+            cls._add_room(row["building"], row["audience"])
+
+        rows = await (ScheduleSubjectModel
+                      .filter(schedule__date__gte=ScheduleTime.date_timestamp(cls._origin))
+                      .values("number", "employee_id", "building", "audience", "schedule__date"))
+        cls.replace((), map(RoomLesson.from_row, rows))
+        logger.info("Occupancy index loaded: {} rooms, {} lessons",
+                    sum(len(rooms) for rooms in cls._rooms.values()), len(rows))
+
+    @classmethod
+    def replace(cls, removed: t.Iterable[RoomLesson], added: t.Iterable[RoomLesson]) -> None:
+        """Drops the lessons a save replaced and adds the saved ones"""
+        cls._advance()
+
+        touched: set[tuple[ddate, int, tuple[int, str]]] = set()
+        for lesson in removed:
+            slot = cls._slots.get((lesson.date, lesson.number))
+            if slot is not None and slot.get(lesson.employee_id) == lesson.room:
+                del slot[lesson.employee_id]
+                touched.add((lesson.date, lesson.number, lesson.room))
+
+        for lesson in added:
+            cls._add_room(*lesson.room)
+            bit = cls._bit(lesson.date, lesson.number)
+            if bit is None or lesson.audience not in cls._rooms.get(lesson.building, {}):
+                continue
+            slot = cls._slots.setdefault((lesson.date, lesson.number), {})
+            previous = slot.get(lesson.employee_id)
+            if previous is not None and previous != lesson.room:
+                touched.add((lesson.date, lesson.number, previous))
+            slot[lesson.employee_id] = lesson.room
+            cls._rooms[lesson.building][lesson.audience] |= 1 << bit
+
+        for day, number, (building, audience) in touched:
+            slot = cls._slots.get((day, number), {})
+            if (building, audience) not in slot.values():
+                cls._rooms[building][audience] &= ~(1 << cls._bit(day, number))
+            if not slot:
+                cls._slots.pop((day, number), None)
+
+    @classmethod
+    def free(cls, building: int, day: ddate, numbers: t.Iterable[int]) -> t.Optional[list[str]]:
+        """Rooms of ``building`` free during every lesson of ``numbers`` on ``day``, None outside the index"""
+        cls._advance()
+
+        mask = 0
+        for number in numbers:
+            bit = cls._bit(day, number)
+            if bit is None:
+                return None
+            mask |= 1 << bit
+
+        rooms = cls._rooms.get(building, {})
+        return sorted((audience for audience, bits in rooms.items() if not bits & mask), key=_natural)
+
+    @classmethod
+    def buildings(cls) -> list[int]:
+        return sorted(cls._rooms)
+
+    @classmethod
+    def _add_room(cls, building: int, audience: str) -> None:
+        # Online lessons come with a blank room
+        if audience and audience.strip():
+            cls._rooms.setdefault(building, {}).setdefault(audience, 0)
+
+    @classmethod
+    def _bit(cls, day: ddate, number: int) -> t.Optional[int]:
+        if day < cls._origin or not 1 <= number <= SLOTS_PER_DAY:
+            return None
+        return (day - cls._origin).days * SLOTS_PER_DAY + number - 1
+
+    @classmethod
+    def _week_start(cls, day: ddate) -> ddate:
+        return day - timedelta(days=day.weekday())
+
+    @classmethod
+    def _advance(cls) -> None:
+        """Drops the weeks that are over by shifting every bitset"""
+        origin = cls._week_start(ddate.today())
+        if origin <= cls._origin:
+            return
+
+        shift = (origin - cls._origin).days * SLOTS_PER_DAY
+        for rooms in cls._rooms.values():
+            for audience in rooms:
+                rooms[audience] >>= shift
+        cls._slots = {key: slot for key, slot in cls._slots.items() if key[0] >= origin}
+        cls._origin = origin
@@ -1,18 +1,40 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+import typing
+from datetime import datetime, date, timedelta
 
-import pytz
 from aiogram import Dispatcher, Bot
 from loguru import logger
 from tortoise.expressions import Q
-from tortoise.query_utils import Prefetch
+from tortoise.transactions import in_transaction
 
 import config
 from schedule_ogu.api import HTTPClient
+from schedule_ogu.api.budget import background_requests
+from schedule_ogu.api.erorrs import HTTPException, UpstreamUnavailable
+from schedule_ogu.api.models import (FacultyHTTP,
+                                     DepartmentHTTP,
+                                     EmployeeHTTP,
+                                     StudentGroupHTTP,
+                                     ScheduleHTTP,
+                                     ScheduleEntryHTTP,
+                                     ExamHTTP)
+from schedule_ogu.services.catalog import Catalog
+from schedule_ogu.services.crawler import CatalogCrawler
+from schedule_ogu.services.digest import DigestJob
+from schedule_ogu.services.freshness import FreshnessRegistry, FreshnessKey, content_hash
+from schedule_ogu.services.refresher import RefreshScheduler
+from schedule_ogu.services.rooms import OccupancyIndex, RoomLesson
+from schedule_ogu.utils.cache import LRUCache
+from schedule_ogu.utils.changes import Lesson, ScheduleDiff, diff_lessons
+from schedule_ogu.utils.metrics import MetricsReporter
 from schedule_ogu.utils.ratelimiter import RateLimiter, BucketType
+from schedule_ogu.utils.render import RendererSchedule
+from schedule_ogu.utils.sender import ThrottledSender
+from schedule_ogu.utils.singleflight import SingleFlight
 from schedule_ogu.utils.time import ScheduleTime
-from schedule_ogu.models.enums import ActionStats, Years, DayType, UserType
+from schedule_ogu.models.enums import ActionStats, Years, DayType, UserType, ObjectKind
 from schedule_ogu.models.db import (ScheduleModel,
                                     ScheduleSubjectModel,
                                     StatsModel,
@@ -21,49 +43,94 @@ from schedule_ogu.models.db import (ScheduleModel,
                                     EmployeeModel,
                                     GroupModel,
                                     UserModel,
+                                    SubscriptionModel,
                                     ExamModel
                                     )
 
-fetch_schedule_ratelimiter = RateLimiter(7200, 1, bucket=BucketType.USER, wait=False)
-fetch_exams_ratelimiter = RateLimiter(7200, 1, bucket=BucketType.USER, wait=False)
-
 fetch_global_schedule_ratelimiter = RateLimiter(7200, 3, bucket=BucketType.GLOBAL, wait=False)
 fetch_global_exams_ratelimiter = RateLimiter(7200, 3, bucket=BucketType.GLOBAL, wait=False)
 
 
+class ScheduleMap(dict[DayType, ScheduleModel]):
+    """Schedule of a week, ``stale`` is set when it was served from the database because the upstream is down"""
+
+    stale: bool = False
+
+
+class ExamList(list[ExamModel]):
+    """Exams of a group or lecturer, ``stale`` is set when they were served from the database because the upstream
+    is down"""
+
+    stale: bool = False
+
+
 class ScheduleService:
     http: HTTPClient = None
 
+    # Concurrent refreshes of the same (UserType, object_id, week_delta) share a single fetch-and-save,
+    # ``coalesced`` counts the calls that were served by someone else's fetch
+    schedule_flight: SingleFlight = SingleFlight()
+    exams_flight: SingleFlight = SingleFlight()
+
+    refresher: typing.Optional[RefreshScheduler] = None
+
+    # Final message texts tagged with the freshness key of the data they were rendered from,
+    # dropped as soon as a fetch persists different data for that key
+    render_cache: LRUCache[str] = LRUCache(config.RENDER_CACHE_MAX_ENTRIES, config.RENDER_CACHE_TTL)
+
+    sender: typing.Optional[ThrottledSender] = None
+    digest: typing.Optional[DigestJob] = None
+    metrics: typing.Optional[MetricsReporter] = None
+    _notifications: set[asyncio.Task] = set()
+
     @classmethod
     async def init(cls):
         cls.http = HTTPClient()
         await cls.http.init()
-        last_update = await StatsModel.filter(action=ActionStats.fetch_data).order_by("-datetime").first()
-        if not last_update or await cls._check_update(ActionStats.fetch_data):
+        await FreshnessRegistry.load()
+        if cls._check_update(FreshnessKey(ActionStats.fetch_data)):
             await cls._update_data()
+        else:
+            await Catalog.refresh()
+        await OccupancyIndex.load()
 
     @classmethod
-    def timestamp_q(cls, week_delta: int):
-        if week_delta < 0:
-            return (Q(date__gte=ScheduleTime.compute_timestamp(week_delta=week_delta + 1))
-                    & Q(date__lte=ScheduleTime.compute_timestamp(week_delta=week_delta)))
-        else:
-            return (Q(date__gte=ScheduleTime.compute_timestamp(week_delta=week_delta))
-                    & Q(date__lte=ScheduleTime.compute_timestamp(week_delta=week_delta + 1)))
+    def timestamp_q(cls, week_delta: int, field: str = "date") -> Q:
+        """Days of the week ``week_delta`` weeks from now, the end is exclusive for past and future weeks alike"""
+        return (Q(**{f"{field}__gte": ScheduleTime.compute_timestamp(week_delta=week_delta)})
+                & Q(**{f"{field}__lt": ScheduleTime.compute_timestamp(week_delta=week_delta + 1)}))
 
     @classmethod
     async def _update_data(cls):
-        faculties = await cls.fetch_faculties()
-        for faculty in faculties:
-            departments = await cls.fetch_departments(faculty.id)
-            for department in departments:
-                await cls.fetch_employees(department.id)
-            await cls.fetch_groups(faculty.id)
+        with background_requests():
+            result = await CatalogCrawler(cls.http).crawl()
+        if result.faculties is None:
+            # Still serve whatever the database has
+            await Catalog.refresh()
+            return
+
+        await cls.save_faculties(result.faculties)
+        for faculty_id, departments in result.departments.items():
+            await cls.save_departments(faculty_id, departments)
+        for department_id, employees in result.employees.items():
+            await cls.save_employees(department_id, employees)
+        for (faculty_id, course), groups in result.groups.items():
+            if not groups:
+                continue
+            await cls.save_groups(faculty_id, course, groups)
+        await Catalog.refresh()
+
+        if not result.complete:
+            logger.warning("Catalog updated partially, failed subtrees: {}", sorted(result.failed))
+            return
 
-        await StatsModel.create(action=ActionStats.fetch_data, datetime=datetime.utcnow())
+        async with in_transaction() as connection:
+            await StatsModel.create(action=ActionStats.fetch_data, datetime=datetime.utcnow(), using_db=connection)
+            marked = await FreshnessRegistry.mark({FreshnessKey(ActionStats.fetch_data): None}, using_db=connection)
+        FreshnessRegistry.remember(marked)
 
     @classmethod
-    async def _check_update(cls, action: ActionStats, user: UserModel = None) -> bool:
+    def _check_update(cls, key: FreshnessKey) -> bool:
         tdict = {
             ActionStats.fetch_schedule: config.UPDATE_FETCH_SCHEDULE,
             ActionStats.fetch_exams: config.UPDATE_FETCH_EXAMS,
@@ -74,17 +141,11 @@ class ScheduleService:
             ActionStats.fetch_data: config.UPDATE_FETCH_DATA
         }
 
-        if user:
-            last_update = await StatsModel.filter(action=action, object_id=user.id).order_by("-datetime").first()
-        else:
-            last_update = await StatsModel.filter(action=action).order_by("-datetime").first()
-        if not last_update:
-            return True
-
-        if last_update.datetime < (datetime.utcnow() - tdict[action]).astimezone(pytz.utc):
-            return True
+        return FreshnessRegistry.is_stale(key, tdict[key.action])
 
-        return False
+    @classmethod
+    def _freshness_key(cls, action: ActionStats, user: UserModel, week: int = 0) -> FreshnessKey:
+        return FreshnessKey(action, ObjectKind.of(user.type), user.object_id, week)
 
     @classmethod
     async def fetch_faculties(
@@ -92,14 +153,24 @@ class ScheduleService:
             with_save: bool = True
     ) -> list[FacultyModel]:
         faculties = await cls.http.get_faculties()
+        return await cls.save_faculties(faculties, with_save=with_save)
 
+    @classmethod
+    async def save_faculties(
+            cls,
+            faculties: list[FacultyHTTP],
+            with_save: bool = True
+    ) -> list[FacultyModel]:
         faculty_models = [FacultyModel(id=faculty.id,
                                        title=faculty.title,
                                        short_title=faculty.short_title) for faculty in faculties]
 
         if with_save:
-            await FacultyModel.all().delete()
-            await FacultyModel.bulk_create(faculty_models, ignore_conflicts=True)
+            # Deleting everything would cascade into departments and groups of subtrees that were not refetched
+            await FacultyModel.filter(~Q(id__in=[faculty.id for faculty in faculty_models])).delete()
+            await FacultyModel.bulk_create(faculty_models,
+                                           on_conflict=("id",),
+                                           update_fields=("title", "short_title"))
             await StatsModel.create(action=ActionStats.fetch_faculties, datetime=datetime.utcnow())
 
         logger.info("Fetched faculties")
@@ -113,14 +184,26 @@ class ScheduleService:
             with_save: bool = True
     ) -> list[DepartmentModel]:
         departments = await cls.http.get_departments(faculty_id)
+        return await cls.save_departments(faculty_id, departments, with_save=with_save)
+
+    @classmethod
+    async def save_departments(
+            cls,
+            faculty_id: int,
+            departments: list[DepartmentHTTP],
+            with_save: bool = True
+    ) -> list[DepartmentModel]:
         department_models = [DepartmentModel(id=department.id,
                                              title=department.title,
                                              short_title=department.short_title,
                                              faculty_id=faculty_id) for department in departments]
 
         if with_save:
-            await DepartmentModel.filter(Q(faculty_id=faculty_id)).delete()
-            await DepartmentModel.bulk_create(department_models, ignore_conflicts=True)
+            await DepartmentModel.filter(Q(faculty_id=faculty_id)
+                                         & ~Q(id__in=[department.id for department in department_models])).delete()
+            await DepartmentModel.bulk_create(department_models,
+                                              on_conflict=("id",),
+                                              update_fields=("title", "short_title", "faculty_id"))
             await StatsModel.create(action=ActionStats.fetch_departments, datetime=datetime.utcnow())
 
         logger.info("Fetched departments for {} faculty", faculty_id)
@@ -134,6 +217,15 @@ class ScheduleService:
             with_save: bool = True
     ) -> list[EmployeeModel]:
         employees = await cls.http.get_employees(department_id)
+        return await cls.save_employees(department_id, employees, with_save=with_save)
+
+    @classmethod
+    async def save_employees(
+            cls,
+            department_id: int,
+            employees: list[EmployeeHTTP],
+            with_save: bool = True
+    ) -> list[EmployeeModel]:
         employee_models = [EmployeeModel(id=employee.id,
                                          name=employee.name,
                                          second_name=employee.second_name,
@@ -141,8 +233,11 @@ class ScheduleService:
                                          department_id=department_id) for employee in employees]
 
         if with_save:
-            await EmployeeModel.filter(Q(department_id=department_id)).delete()
-            await EmployeeModel.bulk_create(employee_models, ignore_conflicts=True)
+            await EmployeeModel.filter(Q(department_id=department_id)
+                                       & ~Q(id__in=[employee.id for employee in employee_models])).delete()
+            await EmployeeModel.bulk_create(employee_models,
+                                            on_conflict=("id",),
+                                            update_fields=("name", "second_name", "middle_name", "department_id"))
             await StatsModel.create(action=ActionStats.fetch_employees, datetime=datetime.utcnow())
 
         logger.info("Fetched employees for {} department", department_id)
@@ -160,22 +255,37 @@ class ScheduleService:
             groups = await cls.http.get_groups(faculty_id, course)
             if not groups:
                 continue
-            group_models = [GroupModel(id=group.id,
-                                       course=course,
-                                       direction=group.direction,
-                                       level=group.level.value,
-                                       name=group.name,
-                                       faculty_id=faculty_id) for group in groups]
-            group_map[course] = group_models
+            group_map[course] = await cls.save_groups(faculty_id, course, groups, with_save=with_save)
 
-            if with_save:
-                await GroupModel.filter(Q(faculty_id=faculty_id) & Q(course=course)).delete()
-                await GroupModel.bulk_create(group_models, ignore_conflicts=True)
-                await StatsModel.create(action=ActionStats.fetch_groups, datetime=datetime.utcnow())
+        return group_map
 
-        logger.info("Fetched groups for {} faculty", faculty_id)
+    @classmethod
+    async def save_groups(
+            cls,
+            faculty_id: int,
+            course: Years,
+            groups: list[StudentGroupHTTP],
+            with_save: bool = True
+    ) -> list[GroupModel]:
+        group_models = [GroupModel(id=group.id,
+                                   course=course,
+                                   direction=group.direction,
+                                   level=group.level.value,
+                                   name=group.name,
+                                   faculty_id=faculty_id) for group in groups]
 
-        return group_map
+        if with_save:
+            await GroupModel.filter(Q(faculty_id=faculty_id)
+                                    & Q(course=course)
+                                    & ~Q(id__in=[group.id for group in group_models])).delete()
+            await GroupModel.bulk_create(group_models,
+                                         on_conflict=("id",),
+                                         update_fields=("direction", "course", "level", "name", "faculty_id"))
+            await StatsModel.create(action=ActionStats.fetch_groups, datetime=datetime.utcnow())
+
+        logger.info("Fetched groups for {} faculty, {} course", faculty_id, course)
+
+        return group_models
 
     @classmethod
     async def fetch_schedule(
@@ -183,73 +293,240 @@ class ScheduleService:
             user: UserModel,
             week_delta: int = 0,
             with_save: bool = True
-    ) -> dict[DayType, ScheduleModel]:
+    ) -> ScheduleMap:
         if user.type == UserType.Student:
             schedule = await cls.http.get_schedule_student(user.group_id, week_delta=week_delta)
         else:
             schedule = await cls.http.get_schedule_employee(user.employee_id, week_delta=week_delta)
         if not schedule:
-            return {}
+            # An empty week is an answer too, refetching it for every user would defeat the freshness window
+            if with_save:
+                await FreshnessRegistry.mark({cls._freshness_key(ActionStats.fetch_schedule, user,
+                                                                 ScheduleTime.compute_timestamp(week_delta)): None})
+            return ScheduleMap()
+
+        subject_map, = await cls.save_schedules(user, [schedule], with_save=with_save)
 
-        subject_map: dict[DayType, ScheduleModel] = {}
+        logger.info("Fetched schedule for {} user", user.id)
 
-        for schedule_day in schedule.days.values():
-            schedule_m = await ScheduleModel.filter(cls.timestamp_q(week_delta) & Q(day=schedule_day.day)).first()
+        return subject_map
+
+    @classmethod
+    async def fetch_schedule_range(
+            cls,
+            user: UserModel,
+            weeks: typing.Iterable[int],
+            with_save: bool = True
+    ) -> dict[int, ScheduleMap]:
+        """Fetches several weeks concurrently and saves them in one go, keyed by week delta"""
+        if user.type == UserType.Student:
+            schedules = await cls.http.get_schedule_student_range(user.group_id, weeks)
+        else:
+            schedules = await cls.http.get_schedule_employee_range(user.employee_id, weeks)
+        empty = [week for week, schedule in schedules.items() if schedule is None]
+        if empty and with_save:
+            # Same as fetch_schedule, empty weeks are an answer too and must not be refetched on every call
+            await FreshnessRegistry.mark({cls._freshness_key(ActionStats.fetch_schedule, user,
+                                                             ScheduleTime.compute_timestamp(week)): None
+                                          for week in empty})
 
-            if not schedule_m:
-                schedule_m = ScheduleModel(day=schedule_day.day, date=schedule_day.date)
+        fetched = {week: schedule for week, schedule in schedules.items() if schedule is not None}
+        subject_maps = (await cls.save_schedules(user, list(fetched.values()), with_save=with_save)
+                        if fetched else [])
 
-            subjects = [ScheduleSubjectModel(**subject.dict(exclude={"employee_name",
-                                                                     "employee_second_name",
-                                                                     "employee_middle_name"}))
-                        for subject in schedule_day.subjects]
+        logger.info("Fetched weeks {} of schedule for {} user", list(schedules), user.id)
 
-            if with_save:
-                if not schedule_m._saved_in_db:
-                    await schedule_m.save()
-
-                subjects = []
-
-                for subject in schedule_day.subjects:
-                    s_m = ScheduleSubjectModel(schedule_id=schedule_m.id,
-                                               **subject.dict(exclude={"employee_name",
-                                                                       "employee_second_name",
-                                                                       "employee_middle_name"}))
-                    s_m.employee = EmployeeModel(id=subject.employee_id,
-                                                 name=subject.employee_name,
-                                                 second_name=subject.employee_second_name,
-                                                 middle_name=subject.employee_middle_name)
-                    s_m.employee._fetched = True
-
-                    s_m.group = GroupModel(id=subject.group_id,
-                                           name=subject.title)
-                    s_m.group._fetched = True
-
-                    subjects.append(s_m)
-
-                await ScheduleSubjectModel.bulk_create(subjects, on_conflict=("schedule_id", "employee_id", "number"),
-                                                       update_fields=("name",
-                                                                      "sub_group",
-                                                                      "audience",
-                                                                      "building",
-                                                                      "type",
-                                                                      "zoom_link",
-                                                                      "zoom_password"))
-
-            schedule_m.subjects.related_objects = subjects
-            schedule_m.subjects._fetched = True
+        return {**{week: ScheduleMap() for week in empty}, **dict(zip(fetched, subject_maps))}
 
-            subject_map[schedule_day.day] = schedule_m
+    @classmethod
+    async def save_schedules(
+            cls,
+            user: UserModel,
+            schedules: list[ScheduleHTTP],
+            with_save: bool = True
+    ) -> list[ScheduleMap]:
+        """Persists whole weeks in one transaction with a constant amount of statements.
+
+        One insert for the missing day rows, one select for their ids, one select of the stored lessons,
+        one upsert for every subject of every week, a delete of vanished lessons, the stats row and
+        the freshness upsert, no matter how many weeks and lessons are saved.
+        Weeks whose content hash matches the last fetch are not written at all, only their freshness is bumped.
+        Changes of weeks that were fetched before are pushed to subscribed users.
+        """
+        days = [schedule_day for schedule in schedules for schedule_day in schedule.days.values()]
+        day_models = {(day.day, day.date): ScheduleModel(day=day.day, date=day.date) for day in days}
+
+        def build_subjects() -> dict[tuple[DayType, int], list[ScheduleSubjectModel]]:
+            return {(day.day, day.date): [cls._subject_model(day_models[(day.day, day.date)], subject)
+                                          for subject in day.subjects]
+                    for day in days}
+
+        hashes = {cls._freshness_key(ActionStats.fetch_schedule, user, schedule.date): cls._week_hash(schedule)
+                  for schedule in schedules}
 
         if with_save:
-            await StatsModel.create(action=ActionStats.fetch_schedule, object_id=user.id, datetime=datetime.utcnow())
+            changed = {key for key, digest in hashes.items() if cls._changed(key, digest)}
+            changed_weeks = [schedule for schedule in schedules
+                             if cls._freshness_key(ActionStats.fetch_schedule, user, schedule.date) in changed]
+            changed_days = {(day.day, day.date) for schedule in changed_weeks for day in schedule.days.values()}
+            # Only weeks seen before that are not over yet are worth a notification
+            notified = {schedule.date for schedule in changed_weeks
+                        if schedule.date + ScheduleTime.time_week > datetime.utcnow().timestamp()
+                        and cls._seen(cls._freshness_key(ActionStats.fetch_schedule, user, schedule.date))}
+            diffs: list[tuple[int, ScheduleDiff]] = []
+
+            if not changed:
+                # Day rows are only read for the ids of the returned models
+                for schedule_m in await ScheduleModel.filter(date__in=[date for _, date in day_models]):
+                    day_models[(schedule_m.day, schedule_m.date)] = schedule_m
+                await FreshnessRegistry.mark(hashes)
+                subjects = build_subjects()
+            else:
+                async with in_transaction() as connection:
+                    await ScheduleModel.bulk_create([day_models[key] for key in changed_days],
+                                                    ignore_conflicts=True,
+                                                    using_db=connection)
+                    # Ids of inserted rows are not returned by bulk inserts, so they are read back in one go
+                    for schedule_m in await ScheduleModel.filter(date__in=[date for _, date in day_models]
+                                                                 ).using_db(connection):
+                        day_models[(schedule_m.day, schedule_m.date)] = schedule_m
+
+                    user_q = (Q(group_id=user.group_id) if user.type == UserType.Student
+                              else Q(employee_id=user.employee_id))
+                    stored = await (ScheduleSubjectModel
+                                    .filter(user_q, schedule__date__in=[date for _, date in changed_days])
+                                    .using_db(connection)
+                                    .values("id", "name", "type", "sub_group", "building", "audience", "number",
+                                            "employee_id", "group_id", "schedule__day", "schedule__date"))
+
+                    vanished = []
+                    for schedule in changed_weeks:
+                        week_stored = [row for row in stored
+                                       if row["schedule__date"] - row["schedule__day"] * 86400 == schedule.date]
+                        fetched = [Lesson.from_entry(subject)
+                                   for day in schedule.days.values() for subject in day.subjects]
+
+                        # Upserts only touch lessons that are still there, the rest would linger forever
+                        slots = {(lesson.day, lesson.number, lesson.employee_id) for lesson in fetched}
+                        vanished.extend(row["id"] for row in week_stored
+                                        if (row["schedule__day"], row["number"], row["employee_id"]) not in slots)
+
+                        if schedule.date in notified:
+                            diff = diff_lessons(map(Lesson.from_row, week_stored), fetched)
+                            if diff:
+                                diffs.append((schedule.date, diff))
+
+                    if vanished:
+                        await ScheduleSubjectModel.filter(id__in=vanished).using_db(connection).delete()
+
+                    subjects = build_subjects()
+                    await ScheduleSubjectModel.bulk_create([subject
+                                                            for key in changed_days
+                                                            for subject in subjects[key]],
+                                                           on_conflict=("schedule_id", "employee_id", "number"),
+                                                           update_fields=("name",
+                                                                          "sub_group",
+                                                                          "audience",
+                                                                          "building",
+                                                                          "type",
+                                                                          "zoom_link",
+                                                                          "zoom_password"),
+                                                           using_db=connection)
+                    await StatsModel.create(action=ActionStats.fetch_schedule,
+                                            object_id=user.id,
+                                            datetime=datetime.utcnow(),
+                                            using_db=connection)
+                    marked = await FreshnessRegistry.mark(hashes, using_db=connection)
+                FreshnessRegistry.remember(marked)
+                for key in changed:
+                    cls.render_cache.invalidate(key)
+                OccupancyIndex.replace(map(RoomLesson.from_row, stored),
+                                       [RoomLesson.from_model(subject, key[1])
+                                        for key in changed_days for subject in subjects[key]])
+
+                if diffs and cls.sender:
+                    task = asyncio.create_task(cls.notify_changes(user.type, user.object_id, diffs))
+                    cls._notifications.add(task)
+                    task.add_done_callback(cls._notifications.discard)
+        else:
+            subjects = build_subjects()
 
-        logger.info("Fetched schedule for {} user", user.id)
+        subject_maps: list[ScheduleMap] = []
+        for schedule in schedules:
+            subject_map = ScheduleMap()
+            for schedule_day in schedule.days.values():
+                schedule_m = day_models[(schedule_day.day, schedule_day.date)]
+                schedule_m.subjects.related_objects = subjects[(schedule_day.day, schedule_day.date)]
+                schedule_m.subjects._fetched = True
+                subject_map[schedule_day.day] = schedule_m
+            subject_maps.append(subject_map)
 
-        return subject_map
+        return subject_maps
 
     @classmethod
-    async def fetch_exams(cls, user: UserModel, with_save: bool = True) -> list[ExamModel]:
+    def _week_hash(cls, schedule: ScheduleHTTP) -> str:
+        return content_hash(sorted(subject.db_fields().items())
+                            for day in schedule.days.values()
+                            for subject in day.subjects)
+
+    @classmethod
+    def _changed(cls, key: FreshnessKey, digest: typing.Optional[str]) -> bool:
+        entry = FreshnessRegistry.get(key)
+        return entry is None or entry.content_hash != digest
+
+    @classmethod
+    def _seen(cls, key: FreshnessKey) -> bool:
+        """Whether non-empty data was fetched for ``key`` before"""
+        entry = FreshnessRegistry.get(key)
+        return entry is not None and entry.content_hash is not None
+
+    @classmethod
+    async def notify_changes(cls, user_type: UserType, object_id: int, diffs: list[tuple[int, ScheduleDiff]]):
+        """Renders every diff once and sends it to the users of the group or lecturer subscribed to changes"""
+        object_q = Q(group_id=object_id) if user_type == UserType.Student else Q(employee_id=object_id)
+        users = await UserModel.filter(object_q, type=user_type).values_list("id", flat=True)
+        chat_ids = await SubscriptionModel.filter(id__in=users, changes=True).values_list("id", flat=True)
+        if not chat_ids:
+            return
+
+        for week, diff in diffs:
+            text = RendererSchedule.render_changes(diff, datetime.fromtimestamp(week).strftime("%d.%m.%Y"))
+            sent = await asyncio.gather(*(cls.sender.send(chat_id, text, disable_web_page_preview=True)
+                                          for chat_id in chat_ids))
+            logger.info("Notified {}/{} users of {} {} about changes",
+                        sum(sent), len(chat_ids), user_type.name, object_id)
+
+    @classmethod
+    def _exam_model(cls, exam: ExamHTTP, group: typing.Optional[GroupModel] = None) -> ExamModel:
+        e_m = ExamModel(**exam.db_fields())
+        # Same as for subjects, rendering fresh exams needs no extra queries
+        e_m.employee = EmployeeModel(id=exam.employee_id,
+                                     name=exam.employee_name,
+                                     second_name=exam.employee_second_name,
+                                     middle_name=exam.employee_middle_name)
+        e_m.employee._fetched = True
+
+        e_m.group = group or GroupModel(id=exam.group_id)
+        e_m.group._fetched = True
+        return e_m
+
+    @classmethod
+    def _subject_model(cls, schedule_m: ScheduleModel, subject: ScheduleEntryHTTP) -> ScheduleSubjectModel:
+        s_m = ScheduleSubjectModel(schedule_id=schedule_m.id, **subject.db_fields())
+        # Relations are filled from the payload, so rendering the fresh week needs no extra queries
+        s_m.employee = EmployeeModel(id=subject.employee_id,
+                                     name=subject.employee_name,
+                                     second_name=subject.employee_second_name,
+                                     middle_name=subject.employee_middle_name)
+        s_m.employee._fetched = True
+
+        s_m.group = GroupModel(id=subject.group_id,
+                               name=subject.title)
+        s_m.group._fetched = True
+        return s_m
+
+    @classmethod
+    async def fetch_exams(cls, user: UserModel, with_save: bool = True) -> ExamList:
         if user.type == UserType.Student:
             schedule = await cls.http.get_exams_student(user.group_id)
             user_q = Q(group_id=user.group_id)
@@ -257,21 +534,50 @@ class ScheduleService:
             schedule = await cls.http.get_exams_employee(user.employee_id)
             user_q = Q(employee_id=user.employee_id)
         if not schedule:
-            return []
-
-        subjects = [ExamModel(**exam.dict(exclude={"employee_name",
-                                                   "employee_second_name",
-                                                   "employee_middle_name"}))
-                    for exam in schedule]
-
-        if with_save:
-            await ExamModel.filter(user_q).delete()
-            await ExamModel.bulk_create(subjects, ignore_conflicts=True)
-            await StatsModel.create(action=ActionStats.fetch_exams, object_id=user.id, datetime=datetime.utcnow())
+            if with_save:
+                await FreshnessRegistry.mark({cls._freshness_key(ActionStats.fetch_exams, user): None})
+            return ExamList()
+
+        # Lecturers see the group of every exam, the payload only has its id
+        groups = ({group.id: group for group in await GroupModel.filter(id__in={exam.group_id for exam in schedule})}
+                  if user.type == UserType.Lecturer else {})
+        subjects = [cls._exam_model(exam, groups.get(exam.group_id)) for exam in schedule]
+
+        key = cls._freshness_key(ActionStats.fetch_exams, user)
+        digest = content_hash(sorted(exam.db_fields().items()) for exam in schedule)
+
+        if with_save and not cls._changed(key, digest):
+            await FreshnessRegistry.mark({key: digest})
+        elif with_save:
+            # Upserted on the upstream cell id, so concurrent refreshes of one group converge instead of
+            # leaving duplicates behind, and only exams that vanished upstream are deleted
+            async with in_transaction() as connection:
+                await ExamModel.bulk_create(subjects,
+                                            on_conflict=("cell_id",),
+                                            update_fields=("day",
+                                                           "date",
+                                                           "name",
+                                                           "sub_group",
+                                                           "dislocation",
+                                                           "number",
+                                                           "type",
+                                                           "time",
+                                                           "employee_id",
+                                                           "group_id"),
+                                            using_db=connection)
+                await ExamModel.filter(user_q & ~Q(cell_id__in=[exam.cell_id for exam in subjects])
+                                       ).using_db(connection).delete()
+                await StatsModel.create(action=ActionStats.fetch_exams,
+                                        object_id=user.id,
+                                        datetime=datetime.utcnow(),
+                                        using_db=connection)
+                marked = await FreshnessRegistry.mark({key: digest}, using_db=connection)
+            FreshnessRegistry.remember(marked)
+            cls.render_cache.invalidate(key)
 
         logger.info("Fetched exams {} for user", user.id)
 
-        return subjects
+        return ExamList(subjects)
 
     @classmethod
     async def get_faculties(cls) -> list[FacultyModel]:
@@ -291,49 +597,241 @@ class ScheduleService:
             user: UserModel,
             week_delta: int = 0,
             with_update: bool = True
-    ) -> dict[DayType, ScheduleModel]:
-        # if with_update and await cls._check_update(action=ActionStats.fetch_schedule, user=user):
-        #     return await cls.fetch_schedule(user, week_delta=week_delta)
-        await fetch_schedule_ratelimiter.acquire(user)
-        if with_update and not fetch_schedule_ratelimiter.is_rate_limited(user):
-            return await cls.fetch_schedule(user, week_delta=week_delta)
+    ) -> ScheduleMap:
+        # Keyed by the group or lecturer and week, so one refresh serves everybody looking at the same schedule
+        key = cls._freshness_key(ActionStats.fetch_schedule, user, ScheduleTime.compute_timestamp(week_delta))
+        # Reads that never refresh, like the digest, are not someone looking at the schedule
+        if cls.refresher and with_update:
+            cls.refresher.touch(user.type, user.object_id)
+        stale = False
+        if with_update and cls._check_update(key):
+            if cls.http.breaker.is_open:
+                stale = True
+            else:
+                try:
+                    schedule = await cls.schedule_flight.do((user.type, user.object_id, week_delta),
+                                                            lambda: cls.fetch_schedule(user, week_delta=week_delta))
+                except (UpstreamUnavailable, HTTPException) as e:
+                    logger.warning("Serving stored schedule for {} user, upstream failed: {}", user.id, e)
+                    stale = True
+                else:
+                    if schedule:
+                        return schedule
+
+        subject_map = await cls._load_week(user, week_delta)
+        subject_map.stale = stale
+        return subject_map
 
+    @classmethod
+    async def _load_week(cls, user: UserModel, week_delta: int = 0) -> ScheduleMap:
+        """Stored week of a user in a single query, days without lessons get an empty in-memory day"""
         user_q = Q(group_id=user.group_id) if user.type == UserType.Student else Q(employee_id=user.employee_id)
-        models = (await ScheduleModel
-                  .filter(cls.timestamp_q(week_delta))
-                  .prefetch_related(Prefetch("subjects", queryset=ScheduleSubjectModel.filter(user_q)
-                                             .prefetch_related("group", "employee"))))
-
-        subject_map: dict[DayType, ScheduleModel] = {day: None for day in DayType}
-        ...
-        for model in models:
-            subject_map[model.day] = model
+        start = ScheduleTime.compute_timestamp(week_delta)
+        subjects = await (ScheduleSubjectModel
+                          .filter(user_q, cls.timestamp_q(week_delta, field="schedule__date"))
+                          .select_related("schedule", "employee", "group"))
+
+        days: dict[DayType, ScheduleModel] = {}
+        lessons: dict[DayType, list[ScheduleSubjectModel]] = {day: [] for day in DayType}
+        for subject in subjects:
+            days.setdefault(subject.schedule.day, subject.schedule)
+            lessons[subject.schedule.day].append(subject)
+
+        subject_map = ScheduleMap()
+        for day in DayType:
+            schedule_m = days.get(day) or ScheduleModel(day=day, date=start + 86400 * day)
+            schedule_m.subjects.related_objects = lessons[day]
+            schedule_m.subjects._fetched = True
+            subject_map[day] = schedule_m
 
         return subject_map
 
+    @classmethod
+    async def get_range(
+            cls,
+            user_type: UserType,
+            object_id: int,
+            start_date: date,
+            end_date: date,
+            with_update: bool = True,
+            chunk: timedelta = timedelta(days=28)
+    ) -> typing.AsyncIterator[ScheduleSubjectModel]:
+        """Lessons of a group or lecturer from ``start_date`` to ``end_date`` inclusive, ordered by date and number.
+
+        Weeks that were never fetched or are stale are fetched first in one concurrent batch, whatever
+        the upstream fails to deliver is served from the database. Lessons come with their day, employee
+        and group and are streamed by one indexed query per ``chunk`` of the range.
+        """
+        if with_update:
+            await cls.refresh_range(user_type, object_id, start_date, end_date)
+
+        object_q = Q(group_id=object_id) if user_type == UserType.Student else Q(employee_id=object_id)
+        day = start_date
+        while day <= end_date:
+            chunk_end = min(day + chunk, end_date + timedelta(days=1))
+            subjects = await (ScheduleSubjectModel
+                              .filter(object_q,
+                                      schedule__date__gte=ScheduleTime.date_timestamp(day),
+                                      schedule__date__lt=ScheduleTime.date_timestamp(chunk_end))
+                              .select_related("schedule", "employee", "group")
+                              .order_by("schedule__date", "number", "sub_group"))
+            for subject in subjects:
+                yield subject
+            day = chunk_end
+
+    @classmethod
+    async def refresh_range(cls, user_type: UserType, object_id: int, start_date: date, end_date: date) -> None:
+        """Fetches the weeks of the range that were never fetched or are stale, in one concurrent batch"""
+        if cls.http.breaker.is_open:
+            return
+
+        owner = cls._object_user(user_type, object_id)
+        weeks = [week for week in cls._weeks_of(start_date, end_date)
+                 if cls._check_update(cls._freshness_key(ActionStats.fetch_schedule,
+                                                         owner,
+                                                         ScheduleTime.compute_timestamp(week)))]
+        if not weeks:
+            return
+        try:
+            await cls.fetch_schedule_range(owner, weeks)
+        except (UpstreamUnavailable, HTTPException) as e:
+            logger.warning("Serving stored range of {} {}, upstream failed: {}", user_type.name, object_id, e)
+
+    @classmethod
+    def range_hash(cls, user_type: UserType, object_id: int, start_date: date, end_date: date) -> str:
+        """Changes whenever the stored lessons of the range change, without touching the database"""
+        owner = cls._object_user(user_type, object_id)
+        entries = []
+        for week in cls._weeks_of(start_date, end_date):
+            entry = FreshnessRegistry.get(cls._freshness_key(ActionStats.fetch_schedule,
+                                                             owner,
+                                                             ScheduleTime.compute_timestamp(week)))
+            entries.append((week, entry.content_hash if entry else None))
+        return content_hash([(start_date.isoformat(), end_date.isoformat()), *entries])
+
+    @classmethod
+    def _weeks_of(cls, start_date: date, end_date: date) -> range:
+        return range(ScheduleTime.week_delta_of(start_date), ScheduleTime.week_delta_of(end_date) + 1)
+
+    @classmethod
+    def _object_user(cls, user_type: UserType, object_id: int) -> UserModel:
+        """Unsaved user standing in for everybody looking at the group or lecturer"""
+        if user_type == UserType.Student:
+            return UserModel(id=0, type=user_type, group_id=object_id)
+        return UserModel(id=0, type=user_type, employee_id=object_id)
+
+    @classmethod
+    def _day_cache_key(cls, user_type: UserType, object_id: int, week: int, day: DayType) -> tuple:
+        return user_type, object_id, week, day
+
+    @classmethod
+    def cached_day(cls, user_type: UserType, object_id: int, day: DayType, week_delta: int = 0) -> typing.Optional[str]:
+        """Already rendered day of anybody's schedule, None unless someone asked for it recently"""
+        return cls.render_cache.get(cls._day_cache_key(user_type,
+                                                       object_id,
+                                                       ScheduleTime.compute_timestamp(week_delta),
+                                                       day))
+
+    @classmethod
+    async def render_day(cls, user: UserModel, day: DayType, week_delta: int = 0) -> str:
+        """Text of a day of the schedule, served from the render cache while the week is fresh"""
+        key = cls._freshness_key(ActionStats.fetch_schedule, user, ScheduleTime.compute_timestamp(week_delta))
+        cache_key = cls._day_cache_key(user.type, user.object_id, key.week, day)
+        if not cls._check_update(key):
+            text = cls.render_cache.get(cache_key)
+            if text is not None:
+                return text
+
+        schedule = await cls.get_schedule(user, week_delta=week_delta)
+        text = RendererSchedule.render_day(user=user, schedule=schedule, day=day)
+        if schedule.stale:
+            return f"{text}\n\n{RendererSchedule.stale_notice}"
+
+        cls.render_cache.put(cache_key, text, tag=key)
+        return text
+
+    @classmethod
+    async def render_exams(cls, user: UserModel) -> str:
+        """Text of the exams, served from the render cache while they are fresh"""
+        key = cls._freshness_key(ActionStats.fetch_exams, user)
+        cache_key = (user.type, user.object_id, "exams")
+        if not cls._check_update(key):
+            text = cls.render_cache.get(cache_key)
+            if text is not None:
+                return text
+
+        exams = await cls.get_exams(user)
+        text = RendererSchedule.render_exams(user, exams)
+        if exams.stale:
+            return f"{text}\n\n{RendererSchedule.stale_notice}"
+
+        cls.render_cache.put(cache_key, text, tag=key)
+        return text
+
+    @classmethod
+    async def refresh_schedule(cls, user: UserModel, week_delta: int = 0) -> bool:
+        """Background refresh of a week, shares the fetch with users asking for the same week meanwhile"""
+        if cls.http.breaker.is_open:
+            return False
+
+        with background_requests():
+            try:
+                await cls.schedule_flight.do((user.type, user.object_id, week_delta),
+                                             lambda: cls.fetch_schedule(user, week_delta=week_delta))
+            except (UpstreamUnavailable, HTTPException) as e:
+                logger.warning("Background refresh of {} {} failed: {}", user.type.name, user.object_id, e)
+                return False
+        return True
+
     @classmethod
     async def get_exams(
             cls,
             user: UserModel,
             with_update: bool = True,
-    ) -> list[ExamModel]:
-        # if with_update and await cls._check_update(action=ActionStats.fetch_exams, user=user):
-        #     return await cls.fetch_exams(user)
-
-        if with_update and not fetch_exams_ratelimiter.is_rate_limited(user):
-            return await cls.fetch_exams(user)
+    ) -> ExamList:
+        stale = False
+        if with_update and cls._check_update(cls._freshness_key(ActionStats.fetch_exams, user)):
+            if cls.http.breaker.is_open:
+                stale = True
+            else:
+                try:
+                    return await cls.exams_flight.do((user.type, user.object_id), lambda: cls.fetch_exams(user))
+                except (UpstreamUnavailable, HTTPException) as e:
+                    logger.warning("Serving stored exams for {} user, upstream failed: {}", user.id, e)
+                    stale = True
 
         user_q = Q(group_id=user.group_id) if user.type == UserType.Student else Q(employee_id=user.employee_id)
-        return await ExamModel.filter(user_q).prefetch_related("employee", "group")
+        exams = ExamList(await ExamModel.filter(user_q).prefetch_related("employee", "group"))
+        exams.stale = stale
+        return exams
 
     @classmethod
     async def on_startup(cls, _: Dispatcher):
         await cls.init()
 
     @classmethod
-    async def on_shutdown(cls, _: Dispatcher):
+    async def on_shutdown(cls, dispatcher: Dispatcher):
+        """Registered with ``dispatcher.shutdown``, aiogram passes handler arguments by name"""
+        if cls.refresher:
+            await cls.refresher.stop()
+        if cls.digest:
+            await cls.digest.stop()
+        if cls.metrics:
+            await cls.metrics.stop()
         await cls.http.close()
 
     @classmethod
-    async def setup(cls, _: Bot):
+    async def setup(cls, bot: Bot):
+        cls.sender = ThrottledSender(bot)
         await cls.init()
+        if config.UNABLE_REFRESHER:
+            cls.refresher = RefreshScheduler(cls.refresh_schedule)
+            cls.refresher.start()
+        if config.UNABLE_DIGEST:
+            cls.digest = DigestJob(cls.sender, lambda user: cls.get_schedule(user, with_update=False))
+            cls.digest.start()
+        if config.UNABLE_METRICS_LOG:
+            cls.metrics = MetricsReporter()
+            cls.metrics.register("request_budget", cls.http.budget.metrics)
+            cls.metrics.register("render_cache", cls.render_cache.metrics)
+            cls.metrics.start()
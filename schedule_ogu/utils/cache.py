@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import sys
+import time
+import typing as t
+from collections import OrderedDict
+from datetime import timedelta
+
+
+__all__ = ("LRUCache",)
+
+V = t.TypeVar("V")
+
+
+class LRUCache(t.Generic[V]):
+    def __init__(self, max_entries: int, ttl: timedelta) -> None:
+        """Bounded in-memory cache evicting the least recently used entries, entries expire after ``ttl``
+
+        Every entry can carry a tag, ``invalidate(tag)`` drops all entries sharing it at once.
+
+        Parameters
+        ----------
+        max_entries : int
+            The maximum amount of entries kept.
+        ttl : timedelta
+            How long an entry is served after it was stored.
+        """
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl.total_seconds()
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.memory: int = 0
+
+        self._entries: OrderedDict[t.Hashable, tuple[V, float, t.Hashable, int]] = OrderedDict()
+        self._tags: dict[t.Hashable, set[t.Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0
+
+    def get(self, key: t.Hashable) -> t.Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] >= self.ttl:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: t.Hashable, value: V, tag: t.Hashable = None) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        size = sys.getsizeof(value)
+        self._entries[key] = (value, time.monotonic(), tag, size)
+        self.memory += size
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, tag: t.Hashable) -> int:
+        """Drops every entry stored with ``tag``, returns how many were dropped"""
+        keys = self._tags.pop(tag, ())
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+        self.memory = 0
+
+    def _remove(self, key: t.Hashable) -> None:
+        _, _, tag, size = self._entries.pop(key)
+        self.memory -= size
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def metrics(self) -> dict[str, float]:
+        return {"entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+                "evictions": self.evictions,
+                "memory": self.memory}
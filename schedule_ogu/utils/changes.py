@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import typing as t
+
+from schedule_ogu.models.enums import DayType, SubjectType
+
+if t.TYPE_CHECKING:
+    from schedule_ogu.api.models import ScheduleEntryHTTP
+
+
+__all__ = ("Lesson",
+           "LessonChange",
+           "ScheduleDiff",
+           "diff_lessons",
+           )
+
+
+class Lesson(t.NamedTuple):
+    day: DayType
+    number: int
+    name: str
+    type: SubjectType
+    sub_group: int
+    employee_id: int
+    group_id: int
+    building: str
+    audience: str
+
+    @classmethod
+    def from_entry(cls, entry: ScheduleEntryHTTP) -> Lesson:
+        return cls(entry.day,
+                   entry.number,
+                   entry.name,
+                   entry.type,
+                   entry.sub_group,
+                   entry.employee_id,
+                   entry.group_id,
+                   str(entry.building),
+                   entry.audience)
+
+    @classmethod
+    def from_row(cls, row: t.Mapping[str, t.Any]) -> Lesson:
+        """From ``ScheduleSubjectModel.values()`` with ``schedule__day``"""
+        return cls(DayType(row["schedule__day"]),
+                   row["number"],
+                   row["name"],
+                   SubjectType(row["type"]),
+                   row["sub_group"],
+                   row["employee_id"],
+                   row["group_id"],
+                   str(row["building"]),
+                   row["audience"])
+
+    @property
+    def identity(self) -> tuple:
+        """What stays the same when a lesson is moved"""
+        return self.name, self.type, self.sub_group, self.employee_id, self.group_id
+
+    @property
+    def slot(self) -> tuple[DayType, int]:
+        return self.day, self.number
+
+    @property
+    def room(self) -> tuple[str, str]:
+        return self.building, self.audience
+
+
+class LessonChange(t.NamedTuple):
+    before: t.Optional[Lesson]
+    after: t.Optional[Lesson]
+
+
+class ScheduleDiff:
+    """Changes of a single week, as seen by one group or lecturer"""
+
+    def __init__(self) -> None:
+        self.added: list[Lesson] = []
+        self.removed: list[Lesson] = []
+        self.moved: list[LessonChange] = []
+        self.rooms: list[LessonChange] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.moved or self.rooms)
+
+
+def diff_lessons(stored: t.Iterable[Lesson], fetched: t.Iterable[Lesson]) -> ScheduleDiff:
+    """Diff of the stored lessons of a week against the freshly fetched ones.
+
+    Lessons are matched by what they are, a match in another slot is a move,
+    a match in the same slot in another room is a room change.
+    """
+    before: dict[tuple, list[Lesson]] = {}
+    for lesson in sorted(set(stored)):
+        before.setdefault(lesson.identity, []).append(lesson)
+    after: dict[tuple, list[Lesson]] = {}
+    for lesson in sorted(set(fetched)):
+        after.setdefault(lesson.identity, []).append(lesson)
+
+    diff = ScheduleDiff()
+    for identity in before.keys() | after.keys():
+        old = before.get(identity, [])
+        new = after.get(identity, [])
+
+        new_slots = {lesson.slot: lesson for lesson in new}
+        kept_slots = set()
+        for lesson in old:
+            match = new_slots.get(lesson.slot)
+            if match is None:
+                continue
+            kept_slots.add(lesson.slot)
+            if match.room != lesson.room:
+                diff.rooms.append(LessonChange(lesson, match))
+
+        old = [lesson for lesson in old if lesson.slot not in kept_slots]
+        new = [lesson for lesson in new if lesson.slot not in kept_slots]
+        diff.moved.extend(LessonChange(was, now) for was, now in zip(old, new))
+        diff.removed.extend(old[len(new):])
+        diff.added.extend(new[len(old):])
+
+    for changes in (diff.added, diff.removed):
+        changes.sort(key=lambda lesson: lesson.slot)
+    for changes in (diff.moved, diff.rooms):
+        changes.sort(key=lambda change: change.after.slot)
+    return diff
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import io
+import typing as t
+from datetime import datetime, time as dtime
+
+import pytz
+
+from schedule_ogu.models.db import ScheduleSubjectModel
+from schedule_ogu.models.enums import UserType
+from schedule_ogu.utils.render import RendererSchedule
+from schedule_ogu.utils.time import ScheduleTime
+
+
+__all__ = ("ICSWriter",)
+
+
+def _escape(text: str) -> str:
+    return (text.replace("\\", "\\\\")
+            .replace(";", "\\;")
+            .replace(",", "\\,")
+            .replace("\r\n", "\\n")
+            .replace("\n", "\\n"))
+
+
+def _utc(value: datetime) -> str:
+    return value.astimezone(pytz.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _lesson_times() -> dict[int, tuple[dtime, dtime]]:
+    times = {}
+    for number, span in RendererSchedule.times.items():
+        start, end = (datetime.strptime(part.strip(), "%H:%M").time() for part in span.split("-"))
+        times[number] = (start, end)
+    return times
+
+
+class ICSWriter:
+    # Lesson times are parsed once from the ones shown in the bot, so both never disagree
+    lesson_times: dict[int, tuple[dtime, dtime]] = _lesson_times()
+
+    def __init__(self, user_type: UserType, title: str, timezone: str) -> None:
+        """Writes an iCalendar feed of lessons one event at a time
+
+        Times are written in UTC, so calendar clients need no timezone definitions.
+
+        Parameters
+        ----------
+        user_type : UserType
+            Whose feed it is, students see the lecturer of a lesson and lecturers the group.
+        title : str
+            The calendar name shown by clients.
+        timezone : str
+            The timezone lesson times are given in.
+        """
+        self.user_type: UserType = user_type
+        self.timezone = pytz.timezone(timezone)
+        self.events: int = 0
+
+        self._buffer = io.StringIO()
+        self._stamp: str = _utc(datetime.now(pytz.utc))
+
+        self._line("BEGIN:VCALENDAR")
+        self._line("VERSION:2.0")
+        self._line("PRODID:-//schedule_ogu//RU")
+        self._line("CALSCALE:GREGORIAN")
+        self._line("METHOD:PUBLISH")
+        self._line(f"X-WR-CALNAME:{_escape(title)}")
+        self._line(f"X-WR-TIMEZONE:{self.timezone.zone}")
+
+    def _line(self, line: str) -> None:
+        # Content lines are folded at 75 octets, continuation lines start with a space
+        encoded = line.encode()
+        limit = 75
+        while len(encoded) > limit:
+            cut = limit
+            # Never split a multibyte character
+            while encoded[cut] & 0xC0 == 0x80:
+                cut -= 1
+            self._buffer.write(encoded[:cut].decode())
+            self._buffer.write("\r\n ")
+            encoded = encoded[cut:]
+            limit = 74
+        self._buffer.write(encoded.decode())
+        self._buffer.write("\r\n")
+
+    def write(self, subject: ScheduleSubjectModel) -> None:
+        """Adds a lesson, it must come with its ``schedule``, ``employee`` and ``group`` fetched"""
+        times = self.lesson_times.get(subject.number)
+        if times is None:
+            return
+
+        day = ScheduleTime.date_of(subject.schedule.date)
+        start, end = (self.timezone.localize(datetime.combine(day, at)) for at in times)
+
+        kind = RendererSchedule.subject_type.get(subject.type)
+        summary = f"{subject.name} ({kind})" if kind else subject.name
+        who = subject.employee.short_full_name if self.user_type == UserType.Student else subject.group.name
+        description = [who]
+        if subject.sub_group:
+            description.append(f"Подгруппа {subject.sub_group}")
+        if subject.zoom_link and subject.zoom_link.strip():
+            description.append(subject.zoom_link.strip())
+            if subject.zoom_password and subject.zoom_password.strip():
+                description.append(f"Пароль: {subject.zoom_password.strip()}")
+
+        self._line("BEGIN:VEVENT")
+        self._line(f"UID:{day:%Y%m%d}-{subject.number}-{subject.group_id}-{subject.employee_id}"
+                   f"-{subject.sub_group}@schedule_ogu")
+        self._line(f"DTSTAMP:{self._stamp}")
+        self._line(f"DTSTART:{_utc(start)}")
+        self._line(f"DTEND:{_utc(end)}")
+        self._line(f"SUMMARY:{_escape(summary)}")
+        self._line(f"LOCATION:{_escape(f'{subject.building}-{subject.audience}')}")
+        self._line(f"DESCRIPTION:{_escape(chr(10).join(description))}")
+        self._line("END:VEVENT")
+        self.events += 1
+
+    async def write_all(self, subjects: t.AsyncIterable[ScheduleSubjectModel]) -> ICSWriter:
+        async for subject in subjects:
+            self.write(subject)
+        return self
+
+    def finish(self) -> bytes:
+        self._line("END:VCALENDAR")
+        return self._buffer.getvalue().encode()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import typing as t
+from datetime import timedelta
+
+from loguru import logger
+
+import config
+
+
+__all__ = ("MetricsReporter",)
+
+
+def _flatten(values: t.Mapping[str, t.Any], prefix: str = "") -> t.Iterator[tuple[str, t.Any]]:
+    for name, value in values.items():
+        if isinstance(value, t.Mapping):
+            yield from _flatten(value, f"{prefix}{name}.")
+        else:
+            yield f"{prefix}{name}", value
+
+
+def _format(value: t.Any) -> str:
+    return f"{value:.3f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+
+
+class MetricsReporter:
+    def __init__(self, interval: timedelta = config.METRICS_LOG_INTERVAL) -> None:
+        """Logs the metrics of every registered source, one line per source every ``interval``
+
+        Parameters
+        ----------
+        interval : timedelta
+            Time between two reports.
+        """
+        self.interval: float = interval.total_seconds()
+        self.sources: dict[str, t.Callable[[], t.Mapping[str, t.Any]]] = {}
+
+        self._task: t.Optional[asyncio.Task] = None
+
+    def register(self, name: str, metrics: t.Callable[[], t.Mapping[str, t.Any]]) -> None:
+        self.sources[name] = metrics
+
+    def snapshot(self) -> dict[str, dict[str, t.Any]]:
+        return {name: dict(_flatten(metrics())) for name, metrics in self.sources.items()}
+
+    def report(self) -> None:
+        for name, values in self.snapshot().items():
+            logger.info("Metrics {}: {}", name, " ".join(f"{key}={_format(value)}" for key, value in values.items()))
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.report()
+            except Exception as e:
+                logger.exception("Metrics report failed: {}", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -4,6 +4,7 @@ from aiogram.utils.markdown import hbold, hlink
 
 from schedule_ogu.models.db import ScheduleSubjectModel, EmployeeModel, ExamModel, UserModel, ScheduleModel
 from schedule_ogu.models.enums import SubjectType, DayType, UserType
+from schedule_ogu.utils.changes import Lesson, ScheduleDiff
 
 
 class RendererSchedule:
@@ -41,6 +42,8 @@ class RendererSchedule:
              7: "18:40 - 20:10",
              8: "20:20 - 21:50"}
 
+    stale_notice = "⚠️ Сайт университета недоступен, расписание может быть неактуальным"
+
     @classmethod
     def render_base_subject(cls, subject: ScheduleSubjectModel) -> str:
         return f"📖 {hbold(f'{subject.number}.')} {subject.name}\n" \
@@ -170,6 +173,74 @@ class RendererSchedule:
 
         return header + "\n\n".join(str_subjects)
 
+    @classmethod
+    def render_week(cls,
+                    user: UserModel,
+                    schedule: dict[DayType, ScheduleModel],
+                    limit: int = 4096
+                    ) -> typing.List[str]:
+        """Every day of the week, packed into as few messages of at most ``limit`` characters as possible"""
+        messages: typing.List[str] = []
+        current = ""
+        for day in DayType:
+            if schedule.get(day) is None:
+                continue
+            text = cls.render_day(user, schedule, day)
+            if current and len(current) + 2 + len(text) <= limit:
+                current += "\n\n" + text
+                continue
+            if current:
+                messages.append(current)
+            current = text
+            # A single day never comes close, but never send something Telegram refuses.
+            # Tags never span lines, so cutting at a line break keeps the HTML intact
+            while len(current) > limit:
+                cut = current.rfind("\n", 0, limit + 1)
+                if cut <= 0:
+                    cut = limit
+                messages.append(current[:cut])
+                current = current[cut:].lstrip("\n")
+        if current:
+            messages.append(current)
+        return messages
+
+    @classmethod
+    def render_lesson_slot(cls, lesson: Lesson) -> str:
+        return f"{cls.days_ru_short[lesson.day]}, {lesson.number} пара ({cls.times[lesson.number]})"
+
+    @classmethod
+    def render_lesson_title(cls, lesson: Lesson) -> str:
+        return f"{hbold(lesson.name)} ({cls.subject_type.get(lesson.type)})"
+
+    @classmethod
+    def render_changes(cls, diff: ScheduleDiff, date: str) -> str:
+        header = f"🔔 Изменения в расписании на неделю с {date}\n\n"
+
+        str_changes: typing.List[str] = []
+        for lesson in diff.added:
+            str_changes.append(f"➕ {cls.render_lesson_slot(lesson)}: {cls.render_lesson_title(lesson)}, "
+                               f"🚪 {lesson.building}-{lesson.audience}")
+        for lesson in diff.removed:
+            str_changes.append(f"❌ {cls.render_lesson_slot(lesson)}: {cls.render_lesson_title(lesson)} отменена")
+        for change in diff.moved:
+            str_changes.append(f"🔀 {cls.render_lesson_title(change.after)}: "
+                               f"{cls.render_lesson_slot(change.before)} → {cls.render_lesson_slot(change.after)}")
+        for change in diff.rooms:
+            str_changes.append(f"🚪 {cls.render_lesson_slot(change.after)}: {cls.render_lesson_title(change.after)}, "
+                               f"{change.before.building}-{change.before.audience} → "
+                               f"{change.after.building}-{change.after.audience}")
+
+        return header + "\n".join(str_changes)
+
+    @classmethod
+    def render_free_rooms(cls, building: int, date: str, numbers: typing.Sequence[int], rooms: list[str]) -> str:
+        pairs = f"{numbers[0]} пара" if len(numbers) == 1 else f"{numbers[0]}-{numbers[-1]} пары"
+        header = f"🚪 Свободные аудитории корпуса {building}, {date}, {pairs} " \
+                 f"({cls.times[numbers[0]].split(' - ')[0]} - {cls.times[numbers[-1]].split(' - ')[1]})\n\n"
+        if not rooms:
+            return header + "Свободных аудиторий нет"
+        return header + ", ".join(f"{building}-{audience}" for audience in rooms)
+
     @classmethod
     def render_exams(cls,
                      user: UserModel,
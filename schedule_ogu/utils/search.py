@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import bisect
+import re
+import typing as t
+
+from schedule_ogu.models.enums import UserType
+
+
+__all__ = ("SearchEntry",
+           "SearchIndex",
+           "normalize",
+           )
+
+_separators = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    return _separators.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchEntry(t.NamedTuple):
+    user_type: UserType
+    object_id: int
+    title: str
+    subtitle: str
+
+
+class SearchIndex:
+    def __init__(self, entries: t.Iterable[SearchEntry]) -> None:
+        """In-memory search over group and lecturer names, immutable once built
+
+        Query words are matched as prefixes of name words through a sorted word list, typos and partial
+        words are caught by trigram overlap. Prefix matches weigh more than trigrams.
+        """
+        self.entries: tuple[SearchEntry, ...] = tuple(entries)
+
+        words: list[tuple[str, int]] = []
+        trigrams: dict[str, list[int]] = {}
+        for index, entry in enumerate(self.entries):
+            text = normalize(entry.title)
+            words.extend((word, index) for word in set(text.split()))
+            for trigram in _trigrams(text):
+                trigrams.setdefault(trigram, []).append(index)
+
+        words.sort()
+        self._words: tuple[str, ...] = tuple(word for word, _ in words)
+        self._word_entries: tuple[int, ...] = tuple(index for _, index in words)
+        self._trigrams: dict[str, tuple[int, ...]] = {trigram: tuple(indexes)
+                                                      for trigram, indexes in trigrams.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, limit: int = 10) -> list[SearchEntry]:
+        text = normalize(query)
+        if not text:
+            return []
+
+        scores: dict[int, float] = {}
+        for word in set(text.split()):
+            start = bisect.bisect_left(self._words, word)
+            end = bisect.bisect_left(self._words, word + "\uffff", lo=start)
+            for position in range(start, end):
+                index = self._word_entries[position]
+                exact = self._words[position] == word
+                scores[index] = scores.get(index, 0) + (3 if exact else 2)
+
+        query_trigrams = _trigrams(text)
+        for trigram in query_trigrams:
+            for index in self._trigrams.get(trigram, ()):
+                scores[index] = scores.get(index, 0) + 1 / len(query_trigrams)
+
+        # Mostly trigram noise below that
+        threshold = 0.5
+        ranked = sorted((index for index, score in scores.items() if score >= threshold),
+                        key=lambda index: (-scores[index], self.entries[index].title))
+        return [self.entries[index] for index in ranked[:limit]]
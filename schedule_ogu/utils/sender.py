@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import typing as t
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+from loguru import logger
+
+import config
+from schedule_ogu.api.budget import BudgetPool
+
+
+__all__ = ("ThrottledSender",)
+
+
+class ThrottledSender:
+    def __init__(
+            self,
+            bot: Bot,
+            rate: int = config.SENDER_RATE,
+            chat_interval: float = config.SENDER_CHAT_INTERVAL,
+            retries: int = 3
+    ) -> None:
+        """Sends messages within Telegram's global and per-chat limits
+
+        Parameters
+        ----------
+        bot : Bot
+            The bot messages are sent with.
+        rate : int
+            The maximum amount of messages per second across all chats.
+        chat_interval : float
+            Seconds between two messages to the same chat.
+        retries : int
+            How many times a message is retried after Telegram asked to slow down.
+        """
+        self.bot: Bot = bot
+        self.chat_interval: float = chat_interval
+        self.retries: int = retries
+
+        self.sent: int = 0
+        self.failed: int = 0
+        self.blocked: int = 0
+
+        self._pool: BudgetPool = BudgetPool("telegram", rate=rate, burst=rate, concurrency=rate)
+        self._chat_next: dict[int, float] = {}
+
+    async def send(self, chat_id: int, text: str, **kwargs: t.Any) -> bool:
+        """Sends ``text`` to ``chat_id``, returns whether it was delivered"""
+        await self._wait_chat(chat_id)
+
+        for attempt in range(self.retries + 1):
+            await self._pool.acquire()
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+            except TelegramRetryAfter as e:
+                logger.warning("Telegram asked to retry after {}s, attempt {}", e.retry_after, attempt + 1)
+                await asyncio.sleep(e.retry_after)
+                continue
+            except TelegramForbiddenError:
+                self.blocked += 1
+                return False
+            except TelegramAPIError as e:
+                logger.warning("Could not send a message to {}: {}", chat_id, e)
+                self.failed += 1
+                return False
+            finally:
+                self._pool.release()
+
+            self.sent += 1
+            return True
+
+        self.failed += 1
+        return False
+
+    async def _wait_chat(self, chat_id: int) -> None:
+        now = time.monotonic()
+        # The slot is reserved before sleeping, so concurrent sends to one chat queue up behind each other
+        at = max(now, self._chat_next.get(chat_id, 0))
+        self._chat_next[chat_id] = at + self.chat_interval
+        if len(self._chat_next) > 10000:
+            self._chat_next = {chat: ready for chat, ready in self._chat_next.items() if ready > now}
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    def metrics(self) -> dict[str, float]:
+        return {"sent": self.sent,
+                "failed": self.failed,
+                "blocked": self.blocked,
+                **self._pool.metrics()}
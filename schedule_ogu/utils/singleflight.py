@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import asyncio
+import typing as t
+
+
+__all__ = ("SingleFlight",)
+
+T = t.TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        """Coalesces concurrent calls sharing a key into a single in-flight call.
+
+        The first caller for a key starts the call, every caller arriving while it
+        is still running awaits the same result instead of starting another one.
+        """
+        self.calls: int = 0
+        self.coalesced: int = 0
+
+        self._flights: dict[t.Hashable, asyncio.Future[t.Any]] = {}
+
+    def in_flight(self, key: t.Hashable) -> bool:
+        return key in self._flights
+
+    async def do(self, key: t.Hashable, func: t.Callable[[], t.Awaitable[T]]) -> T:
+        """Await ``func()``, or the call already running for ``key``."""
+        future = self._flights.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(func())
+            self._flights[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+
+        # Shielded, so a cancelled caller does not cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    def _finish(self, key: t.Hashable, future: asyncio.Future[t.Any]) -> None:
+        if self._flights.get(key) is future:
+            del self._flights[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled
+            future.exception()
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date as ddate
 
 import config
 
@@ -30,6 +30,21 @@ class ScheduleTime:
 
         return time + (cls.week_delta(week_delta)) * cls.time_week
 
+    @classmethod
+    def date_timestamp(cls, date: ddate) -> int:
+        """Timestamp stored as ``ScheduleModel.date`` for the day ``date``"""
+        return int(datetime(year=date.year, month=date.month, day=date.day, minute=5).timestamp()) \
+            + cls.base_week_delta * cls.time_week
+
+    @classmethod
+    def date_of(cls, timestamp: int) -> ddate:
+        """The day stored as ``ScheduleModel.date`` ``timestamp``"""
+        return datetime.fromtimestamp(timestamp - cls.base_week_delta * cls.time_week).date()
+
+    @classmethod
+    def week_delta_of(cls, date: ddate) -> int:
+        return (cls.date_timestamp(date) - cls.compute_timestamp()) // cls.time_week
+
     @classmethod
     def compute_datetime(cls, week_delta: int = 0):
         return datetime.fromtimestamp(cls.compute_timestamp(week_delta))
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import typing as t
+from datetime import datetime
+
+import pytz
+from aiohttp import web
+from loguru import logger
+
+import config
+from schedule_ogu.models.enums import UserType
+from schedule_ogu.services.catalog import Catalog
+from schedule_ogu.services.schedule import ScheduleService
+from schedule_ogu.utils.cache import LRUCache
+from schedule_ogu.utils.ics import ICSWriter
+from schedule_ogu.utils.singleflight import SingleFlight
+
+
+__all__ = ("CalendarFeed",)
+
+_kinds = {"group": UserType.Student, "employee": UserType.Lecturer}
+
+
+class CalendarFeed:
+    def __init__(
+            self,
+            host: str = config.web_config.host,
+            port: int = config.web_config.port,
+            timezone: str = config.ICS_TIMEZONE
+    ) -> None:
+        """Serves the lessons of a group or lecturer as an iCalendar feed
+
+        The ETag of a feed is derived from the content hashes of its weeks, so checking whether a client
+        copy is current costs no query. A feed is rebuilt only after a fetch actually changed its lessons,
+        concurrent requests for one feed share the rebuild.
+
+        Parameters
+        ----------
+        host : str
+            The interface the server listens on.
+        port : int
+            The port the server listens on.
+        timezone : str
+            The timezone lessons and the feed window are given in.
+        """
+        self.host: str = host
+        self.port: int = port
+        self.timezone: str = timezone
+
+        self.served: int = 0
+        self.not_modified: int = 0
+        self.built: int = 0
+
+        self.cache: LRUCache[bytes] = LRUCache(config.ICS_CACHE_MAX_ENTRIES, config.ICS_CACHE_TTL)
+        self._flight: SingleFlight = SingleFlight()
+        self._runner: t.Optional[web.AppRunner] = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(r"/ics/{kind:group|employee}/{object_id:\d+}.ics", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        user_type = _kinds[request.match_info["kind"]]
+        object_id = int(request.match_info["object_id"])
+        if (user_type, object_id) not in Catalog.snapshot.titles:
+            raise web.HTTPNotFound()
+
+        etag, body = await self._flight.do((user_type, object_id), lambda: self.feed(user_type, object_id))
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("If-None-Match", "")
+        if if_none_match.strip() == "*" or f'"{etag}"' in if_none_match:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+
+        self.served += 1
+        return web.Response(body=body,
+                            headers={**headers,
+                                     "Content-Type": "text/calendar; charset=utf-8",
+                                     "Content-Disposition": f'inline; filename="{object_id}.ics"'})
+
+    async def feed(self, user_type: UserType, object_id: int) -> tuple[str, bytes]:
+        """Returns the ETag and body of a feed, fetching its stale weeks first"""
+        today = datetime.now(pytz.timezone(self.timezone)).date()
+        start_date, end_date = today - config.ICS_PAST, today + config.ICS_FUTURE
+
+        await ScheduleService.refresh_range(user_type, object_id, start_date, end_date)
+        etag = ScheduleService.range_hash(user_type, object_id, start_date, end_date)
+        key = (user_type, object_id, etag)
+        body = self.cache.get(key)
+        if body is None:
+            writer = ICSWriter(user_type, Catalog.snapshot.titles[(user_type, object_id)], self.timezone)
+            await writer.write_all(ScheduleService.get_range(user_type, object_id, start_date, end_date,
+                                                             with_update=False))
+            body = writer.finish()
+            # Tagged by object, so the previous version of a feed is dropped once it changed
+            self.cache.invalidate((user_type, object_id))
+            self.cache.put(key, body, tag=(user_type, object_id))
+            self.built += 1
+            logger.debug("Calendar feed of {} {} built: {} events", user_type.name, object_id, writer.events)
+        return etag, body
+
+    async def start(self) -> None:
+        if self._runner is not None:
+            return
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Calendar feed listening on {}:{}", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def metrics(self) -> dict[str, float]:
+        return {"served": self.served,
+                "not_modified": self.not_modified,
+                "built": self.built,
+                **{f"cache_{name}": value for name, value in self.cache.metrics().items()}}
@@ -0,0 +1,13 @@
+import os
+
+# config.py reads these at import time, the tests never reach Telegram or Postgres
+for name, value in {"BOT_TOKEN": "1:test",
+                    "BOT_HAS_DISPLAY": "1",
+                    "BOT_CHROME_DRIVER_DIR": "/nonexistent",
+                    "BOT_SUPERUSER_STARTUP_NOTIFIER": "0",
+                    "POSTGRES_DB": "test",
+                    "POSTGRES_HOST": "localhost",
+                    "POSTGRES_PASSWORD": "test",
+                    "POSTGRES_PORT": "5432",
+                    "POSTGRES_USER": "test"}.items():
+    os.environ.setdefault(name, value)
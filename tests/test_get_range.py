@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from schedule_ogu.models.enums import UserType
+from schedule_ogu.services.schedule import ScheduleService
+from schedule_ogu.utils.time import ScheduleTime
+
+from test_save_schedules import run, week
+
+
+class Breaker:
+    is_open = False
+
+
+class OneWeekUpstream:
+    """Answers week 0 and has nothing for any other week"""
+
+    breaker = Breaker()
+
+    def __init__(self) -> None:
+        self.calls: list[list[int]] = []
+
+    async def get_schedule_student_range(self, group_id, weeks):
+        self.calls.append(list(weeks))
+        return {delta: week(delta) if delta == 0 else None for delta in weeks}
+
+
+def test_empty_weeks_are_not_refetched():
+    async def test(_):
+        upstream = ScheduleService.http = OneWeekUpstream()
+        start = date.today() - timedelta(days=date.today().weekday())
+        end = start + timedelta(days=20)
+        weeks = list(range(ScheduleTime.week_delta_of(start), ScheduleTime.week_delta_of(end) + 1))
+
+        for _ in range(3):
+            lessons = [subject async for subject in ScheduleService.get_range(UserType.Student, 7001, start, end)]
+
+        assert upstream.calls == [weeks]
+        assert lessons and all(ScheduleTime.week_delta_of(ScheduleTime.date_of(subject.schedule.date)) == 0
+                                for subject in lessons)
+
+    run(test)
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import pathlib
+
+import pytest
+from tortoise import Tortoise
+
+from schedule_ogu.api import decode
+from schedule_ogu.api.models import ScheduleHTTP
+from schedule_ogu.models.db import (FacultyModel,
+                                    DepartmentModel,
+                                    EmployeeModel,
+                                    GroupModel,
+                                    UserModel,
+                                    ScheduleModel,
+                                    ScheduleSubjectModel)
+from schedule_ogu.models.enums import UserType
+from schedule_ogu.services.freshness import FreshnessRegistry
+from schedule_ogu.services.schedule import ScheduleService
+from schedule_ogu.utils.time import ScheduleTime
+
+FIXTURE = pathlib.Path(__file__).parent.parent / "benchmarks" / "fixtures" / "printschedule.json"
+
+
+class StatementCounter(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+
+@pytest.fixture
+def statements():
+    counter = StatementCounter()
+    db_logger = logging.getLogger("tortoise.db_client")
+    level = db_logger.level
+    db_logger.setLevel(logging.DEBUG)
+    db_logger.addHandler(counter)
+    yield counter
+    db_logger.removeHandler(counter)
+    db_logger.setLevel(level)
+
+
+def week(delta: int, days: int = 6, room: str = None) -> ScheduleHTTP:
+    """The fixture week moved ``delta`` weeks from now, cut to its first ``days`` days"""
+    data = json.loads(FIXTURE.read_text())
+    entries = {"week": data["week"]}
+    for index, entry in data.items():
+        if index.isdigit() and entry["DayWeek"] <= days:
+            # Cell ids are unique upstream, every week gets its own
+            entry["id_cell"] = str(int(entry["id_cell"]) + 1000 * (delta + 5))
+            if room is not None:
+                entry["NumberRoom"] = room
+            entries[index] = entry
+    return ScheduleHTTP(ScheduleTime.compute_timestamp(delta), decode.schedule_entries(entries))
+
+
+async def setup_db() -> UserModel:
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"main": ["schedule_ogu.models.db"]})
+    await Tortoise.generate_schemas()
+    FreshnessRegistry._entries = {}
+    await FacultyModel.create(id=10, title="Faculty", short_title="F")
+    await DepartmentModel.create(id=200, title="Department", short_title="D", faculty_id=10)
+    for employee_id in (1101, 1102, 1103, 1104):
+        await EmployeeModel.create(id=employee_id, name="Иван", second_name="Петров", middle_name="Сергеевич",
+                                   department_id=200)
+    await GroupModel.create(id=7001, direction="x", course=1, level=0, name="22-ПИ", faculty_id=10)
+    return await UserModel.create(id=1, group_id=7001, type=UserType.Student)
+
+
+def run(test):
+    async def wrapper():
+        try:
+            await test(await setup_db())
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(wrapper())
+
+
+async def save(statements: StatementCounter, user: UserModel, schedules: list[ScheduleHTTP]) -> int:
+    statements.count = 0
+    await ScheduleService.save_schedules(user, schedules)
+    return statements.count
+
+
+def test_new_weeks_take_constant_statements(statements):
+    async def test(user):
+        one_day = await save(statements, user, [week(0, days=1)])
+        full_week = await save(statements, user, [week(1)])
+        three_weeks = await save(statements, user, [week(2), week(3), week(4)])
+
+        assert one_day == full_week == three_weeks
+        assert await ScheduleSubjectModel.all().count() == 3 + 14 * 4
+
+    run(test)
+
+
+def test_changed_weeks_take_constant_statements(statements):
+    async def test(user):
+        await save(statements, user, [week(0, days=1), week(1)])
+
+        small = await save(statements, user, [week(0, days=1, room="101")])
+        large = await save(statements, user, [week(0, room="202"), week(1, room="202")])
+
+        assert small == large
+        assert set(await ScheduleSubjectModel.all().values_list("audience", flat=True)) == {"202"}
+
+    run(test)
+
+
+def test_unchanged_weeks_are_not_rewritten(statements):
+    async def test(user):
+        await save(statements, user, [week(0), week(1)])
+        days = await ScheduleModel.all().count()
+
+        one_week = await save(statements, user, [week(0)])
+        two_weeks = await save(statements, user, [week(0), week(1)])
+
+        # The day ids and the freshness upsert, nothing else
+        assert one_week == two_weeks == 2
+        assert await ScheduleModel.all().count() == days
+
+    run(test)